@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from .authentication import clear_auth_caches, invalidate_user
+        from .revocation import reset_revocation_store
+        user_model = get_user_model()
+        post_save.connect(invalidate_user, sender=user_model)
+        post_delete.connect(invalidate_user, sender=user_model)
+        post_migrate.connect(clear_auth_caches)
+        post_migrate.connect(reset_revocation_store)
@@ -0,0 +1,207 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocation_store
+from .stores import (
+    database_identity, file_lock, file_stamp, remove_file, replace_file)
+
+USER_SNAPSHOT_FIELDS = ('id', 'username', 'role', 'is_superuser', 'is_active')
+
+
+class LRUCache:
+    """Thread-safe LRU of at most `maxsize` entries, each with a TTL."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            deadline, value = entry
+            if deadline <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = LRUCache(
+    settings.JWT_AUTH_CACHE_SIZE, settings.JWT_AUTH_CACHE_TTL)
+user_cache = LRUCache(
+    settings.JWT_AUTH_CACHE_SIZE, settings.JWT_AUTH_CACHE_TTL)
+
+
+class UserInvalidationLog:
+    """Recent user changes shared by worker processes through a file.
+
+    Each entry is a (sequence, user id) pair; the file keeps the last
+    JWT_AUTH_INVALIDATION_LOG_SIZE of them. A process that finds entries
+    newer than the last one it has seen drops those users' snapshots, and
+    its whole user cache if it fell behind the kept entries, or if the
+    file was written for another database.
+    """
+
+    magic = b'YUI1'
+    header = struct.Struct('>4s8s')
+    entry = struct.Struct('>QQ')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._seen = None
+            self._stamp = None
+            self._checked = None
+
+    @property
+    def path(self):
+        return settings.JWT_AUTH_INVALIDATION_PATH
+
+    def read(self):
+        """Entries of the log, or None if it belongs to another database."""
+        try:
+            with open(self.path, 'rb') as log:
+                data = log.read()
+        except FileNotFoundError:
+            return []
+        header = self.header.pack(self.magic, database_identity())
+        if data[:self.header.size] != header:
+            return None
+        return list(self.entry.iter_unpack(data[self.header.size:]))
+
+    def publish(self, user_id):
+        with file_lock(self.path):
+            entries = self.read() or []
+            sequence = entries[-1][0] + 1 if entries else 1
+            entries.append((sequence, user_id))
+            entries = entries[-settings.JWT_AUTH_INVALIDATION_LOG_SIZE:]
+            replace_file(self.path, b''.join([
+                self.header.pack(self.magic, database_identity()),
+                *(self.entry.pack(*entry) for entry in entries),
+            ]))
+
+    def sync(self, cache):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked is not None and (
+                    now - self._checked < settings.JWT_AUTH_SYNC_INTERVAL):
+                return
+            self._checked = now
+            stamp = file_stamp(self.path)
+            if stamp == self._stamp and self._seen is not None:
+                return
+            entries = self.read()
+            if entries is None:
+                cache.clear()
+                entries = []
+                self._seen = 0
+            last = entries[-1][0] if entries else 0
+            if self._seen is not None:
+                if last < self._seen or (
+                        entries and entries[0][0] > self._seen + 1):
+                    cache.clear()
+                else:
+                    for sequence, user_id in entries:
+                        if sequence > self._seen:
+                            cache.pop(user_id)
+            self._seen = last
+            self._stamp = stamp
+
+
+invalidation_log = UserInvalidationLog()
+
+
+def invalidate_user(sender, instance, **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    user_cache.pop(user_id)
+
+    def publish():
+        user_cache.pop(user_id)
+        invalidation_log.publish(user_id)
+
+    transaction.on_commit(publish)
+
+
+def clear_auth_caches(**kwargs):
+    remove_file(settings.JWT_AUTH_INVALIDATION_PATH)
+    invalidation_log.reset()
+    token_cache.clear()
+    user_cache.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that remembers verified tokens and user rows.
+
+    Only the columns the permissions need are cached; any other attribute
+    of `request.user` is loaded from the database on first access. Changes
+    made by other processes reach this one within JWT_AUTH_SYNC_INTERVAL.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snapshot_fields = tuple(
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in USER_SNAPSHOT_FIELDS
+        )
+
+    def get_validated_token(self, raw_token):
+        validated_token = token_cache.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            token_cache.set(
+                raw_token, validated_token,
+                ttl=validated_token['exp'] - time.time())
+        if revocation_store.is_revoked(validated_token):
+            raise AuthenticationFailed('Токен отозван', code='token_revoked')
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                'Токен не содержит идентификатор пользователя')
+        invalidation_log.sync(user_cache)
+        values = user_cache.get(user_id)
+        if values is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, tuple(
+                getattr(user, field) for field in self.snapshot_fields))
+            return user
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, self.snapshot_fields, values)
@@ -0,0 +1,61 @@
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class BatchSlugManyRelatedField(ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.resolve(list(data))
+
+
+class BatchSlugRelatedField(serializers.SlugRelatedField):
+    """Resolves slugs with one IN query, cached for the whole request."""
+
+    default_error_messages = {
+        'does_not_exist_many': 'Не найдены объекты с {slug_name}: {value}.',
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchSlugManyRelatedField(**list_kwargs)
+
+    def get_cache(self):
+        request = self.context.get('request')
+        if request is None:
+            return {}
+        caches = request.__dict__.setdefault('slug_related_cache', {})
+        key = (self.get_queryset().model._meta.label, self.slug_field)
+        return caches.setdefault(key, {})
+
+    def resolve(self, slugs):
+        if any(not isinstance(slug, (str, int)) for slug in slugs):
+            self.fail('invalid')
+        slugs = [str(slug) for slug in slugs]
+        cache = self.get_cache()
+        missing = {slug for slug in slugs if slug not in cache}
+        if missing:
+            for obj in self.get_queryset().filter(
+                    **{f'{self.slug_field}__in': missing}):
+                cache[str(getattr(obj, self.slug_field))] = obj
+        unknown = [slug for slug in dict.fromkeys(slugs) if slug not in cache]
+        if len(unknown) == 1:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field, value=unknown[0])
+        if unknown:
+            self.fail(
+                'does_not_exist_many',
+                slug_name=self.slug_field,
+                value=', '.join(unknown)
+            )
+        return [cache[slug] for slug in slugs]
+
+    def to_internal_value(self, data):
+        return self.resolve([data])[0]
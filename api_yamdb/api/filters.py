@@ -1,14 +1,69 @@
 import django_filters as filters
+from django.db.models import Count
 
-from reviews.models import Title
+from reviews.models import Comment, Title
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_CHOICES = (
+    (MATCH_ANY, MATCH_ANY),
+    (MATCH_ALL, MATCH_ALL),
+)
+
+
+def split_slugs(value):
+    return sorted({slug.strip() for slug in value.split(',') if slug.strip()})
 
 
 class TitleFilter(filters.FilterSet):
-    genre = filters.CharFilter(field_name='genre__slug')
-    category = filters.CharFilter(field_name='category__slug')
+    genre = filters.CharFilter(method='filter_genre')
+    genre_match = filters.ChoiceFilter(
+        choices=MATCH_CHOICES, method='filter_match')
+    category = filters.CharFilter(method='filter_category')
     year = filters.NumberFilter(field_name='year')
+    year_min = filters.NumberFilter(field_name='year', lookup_expr='gte')
+    year_max = filters.NumberFilter(field_name='year', lookup_expr='lte')
+    decade = filters.NumberFilter(method='filter_decade')
     name = filters.CharFilter(field_name='name', lookup_expr='contains')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
         fields = '__all__'
+
+    def filter_genre(self, queryset, name, value):
+        slugs = split_slugs(value)
+        if not slugs:
+            return queryset
+        title_ids = Title.genre.through.objects.filter(
+            genre__slug__in=slugs).values('title_id')
+        if self.form.cleaned_data.get('genre_match') == MATCH_ALL:
+            title_ids = title_ids.annotate(
+                genres_count=Count('genre_id')
+            ).filter(genres_count=len(slugs)).values('title_id')
+        return queryset.filter(id__in=title_ids)
+
+    def filter_match(self, queryset, name, value):
+        return queryset
+
+    def filter_category(self, queryset, name, value):
+        slugs = split_slugs(value)
+        if not slugs:
+            return queryset
+        return queryset.filter(category__slug__in=slugs)
+
+    def filter_decade(self, queryset, name, value):
+        start = int(value) // 10 * 10
+        return queryset.filter(year__range=(start, start + 9))
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
+
+
+class CommentFilter(filters.FilterSet):
+    since_id = filters.NumberFilter(field_name='id', lookup_expr='gt')
+    since = filters.IsoDateTimeFilter(field_name='pub_date', lookup_expr='gt')
+
+    class Meta:
+        model = Comment
+        fields = ('since_id', 'since')
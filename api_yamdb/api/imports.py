@@ -0,0 +1,178 @@
+import json
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from reviews.models import (
+    Comment, ResourceVersion, Review, ScoreCount, Title, User)
+from reviews.notifications import comment_notifier
+
+
+class ReviewImportSerializer(serializers.Serializer):
+    title_id = serializers.IntegerField()
+    author = serializers.CharField(max_length=255)
+    text = serializers.CharField()
+    score = serializers.IntegerField(min_value=1, max_value=10)
+
+
+class CommentImportSerializer(serializers.Serializer):
+    review_id = serializers.IntegerField()
+    author = serializers.CharField(max_length=255)
+    text = serializers.CharField()
+
+
+IMPORT_SERIALIZERS = {
+    'review': ReviewImportSerializer,
+    'comment': CommentImportSerializer,
+}
+
+
+def dump(data):
+    return json.dumps(data, ensure_ascii=False) + '\n'
+
+
+class NdjsonImporter:
+    """Imports reviews and comments from a stream of JSON lines.
+
+    Lines are validated and inserted in batches, one transaction per
+    batch, and the result of every batch is yielded as a JSON line.
+    """
+
+    def __init__(self, stream, batch_size=None):
+        self.stream = stream
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.created = Counter()
+        self.errors = 0
+
+    def parse(self, number, line):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None, {'line': number, 'errors': ['Некорректный JSON']}
+        if not isinstance(data, dict):
+            return None, {'line': number, 'errors': ['Ожидается объект']}
+        serializer_class = IMPORT_SERIALIZERS.get(data.get('type'))
+        if serializer_class is None:
+            return None, {
+                'line': number, 'errors': {'type': ['review или comment']}}
+        serializer = serializer_class(data=data)
+        if not serializer.is_valid():
+            return None, {'line': number, 'errors': serializer.errors}
+        return (data['type'], number, serializer.validated_data), None
+
+    def import_reviews(self, records, authors):
+        title_ids = set(Title.objects.filter(
+            id__in={data['title_id'] for _, data in records}
+        ).values_list('id', flat=True))
+        taken = set(Review.objects.filter(
+            title_id__in=title_ids,
+            author_id__in=authors.values()
+        ).values_list('title_id', 'author_id'))
+        reviews, errors = [], []
+        for number, data in records:
+            author_id = authors.get(data['author'])
+            key = (data['title_id'], author_id)
+            if data['title_id'] not in title_ids:
+                errors.append({'line': number, 'errors': {
+                    'title_id': ['Произведение не найдено']}})
+            elif author_id is None:
+                errors.append({'line': number, 'errors': {
+                    'author': ['Пользователь не найден']}})
+            elif key in taken:
+                errors.append({'line': number, 'errors': [
+                    'Может существовать только один отзыв!']})
+            else:
+                taken.add(key)
+                reviews.append(Review(
+                    title_id=data['title_id'], author_id=author_id,
+                    text=data['text'], score=data['score']
+                ))
+        Review.objects.bulk_create(reviews)
+        scores = defaultdict(list)
+        for review in reviews:
+            scores[review.title_id].append(review.score)
+        for title_id, title_scores in scores.items():
+            Title.objects.filter(id=title_id).change_rating(
+                sum(title_scores), len(title_scores))
+            for score, count in Counter(title_scores).items():
+                ScoreCount.objects.change(title_id, score, count)
+        if reviews:
+            ResourceVersion.bump('titles')
+        return len(reviews), errors
+
+    def import_comments(self, records, authors):
+        review_ids = set(Review.objects.filter(
+            id__in={data['review_id'] for _, data in records}
+        ).values_list('id', flat=True))
+        comments, errors = [], []
+        for number, data in records:
+            author_id = authors.get(data['author'])
+            if data['review_id'] not in review_ids:
+                errors.append({'line': number, 'errors': {
+                    'review_id': ['Отзыв не найден']}})
+            elif author_id is None:
+                errors.append({'line': number, 'errors': {
+                    'author': ['Пользователь не найден']}})
+            else:
+                comments.append(Comment(
+                    review_id=data['review_id'], author_id=author_id,
+                    text=data['text']
+                ))
+        Comment.objects.bulk_create(comments)
+        for review_id in {comment.review_id for comment in comments}:
+            transaction.on_commit(
+                partial(comment_notifier.notify, review_id))
+        return len(comments), errors
+
+    @transaction.atomic
+    def import_batch(self, records):
+        authors = dict(User.objects.filter(username__in={
+            data['author'] for _, _, data in records
+        }).values_list('username', 'id'))
+        created, errors = {}, []
+        for kind, method in (
+            ('review', self.import_reviews),
+            ('comment', self.import_comments),
+        ):
+            batch = [
+                (number, data) for record_kind, number, data in records
+                if record_kind == kind
+            ]
+            if batch:
+                created[kind], kind_errors = method(batch, authors)
+                errors.extend(kind_errors)
+        return created, errors
+
+    def lines(self):
+        for number, line in enumerate(self.stream, 1):
+            line = line.strip()
+            if line:
+                yield number, line
+
+    def __iter__(self):
+        lines = self.lines()
+        while True:
+            chunk = list(islice(lines, self.batch_size))
+            if not chunk:
+                break
+            records, errors = [], []
+            for number, line in chunk:
+                record, error = self.parse(number, line)
+                if error is None:
+                    records.append(record)
+                else:
+                    errors.append(error)
+            if records:
+                created, batch_errors = self.import_batch(records)
+                self.created.update(created)
+                errors.extend(batch_errors)
+            self.errors += len(errors)
+            for error in sorted(errors, key=lambda error: error['line']):
+                yield dump(error)
+            yield dump({'processed': chunk[-1][0], 'created': self.created})
+        yield dump({
+            'done': True, 'created': self.created, 'errors': self.errors})
@@ -0,0 +1,180 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe, urlencode
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from reviews.models import ResourceVersion
+
+
+class SparseFieldsViewMixin:
+    """Loads only the columns and relations the trimmed serializer needs."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if (
+            self.request.method not in SAFE_METHODS
+            or ('fields' not in params and 'omit' not in params)
+        ):
+            return queryset
+        sources = {
+            field.source.split('.')[0]
+            for field in self.get_serializer().fields.values()
+        }
+        opts = queryset.model._meta
+        columns = {opts.pk.name}
+        for source in sources:
+            try:
+                model_field = opts.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(source)
+        select_related = queryset.query.select_related
+        if isinstance(select_related, dict):
+            queryset = queryset.select_related(None).select_related(
+                *(name for name in select_related if name in columns))
+        prefetch_related = queryset._prefetch_related_lookups
+        if prefetch_related:
+            queryset = queryset.prefetch_related(None).prefetch_related(*(
+                lookup for lookup in prefetch_related
+                if getattr(lookup, 'prefetch_to', lookup).split('__')[0]
+                in sources
+            ))
+        return queryset.only(*columns)
+
+
+class FastListMixin:
+    """Opt-in list rendering through fast_list_serializer_class."""
+
+    fast_list_serializer_class = None
+
+    def use_fast_list(self, request):
+        return (
+            settings.FAST_LIST_SERIALIZATION
+            and self.fast_list_serializer_class is not None
+            and 'fields' not in request.query_params
+            and 'omit' not in request.query_params
+            and 'expand' not in request.query_params
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+        serializer = self.fast_list_serializer_class()
+        rows = serializer.get_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page))
+        return Response(serializer.to_representation(list(rows)))
+
+
+class ConditionalGetMixin:
+    version_resources = ()
+
+    def get_versions_key(self):
+        versions = sorted(ResourceVersion.objects.filter(
+            resource__in=self.version_resources
+        ).values_list('resource', 'version', 'updated'))
+        self.last_modified = max(
+            (updated for _, _, updated in versions), default=None)
+        return ';'.join(
+            f'{resource}:{version}:{updated.timestamp()}'
+            for resource, version, updated in versions
+        )
+
+    def get_validators(self, request):
+        self.versions_key = self.get_versions_key()
+        digest = hashlib.md5(
+            f'{self.versions_key}|{request.get_full_path()}'.encode()
+        ).hexdigest()
+        last_modified = None
+        if self.last_modified is not None:
+            # HTTP dates have whole seconds: advertise the end of the
+            # second of the last write, but only once that second is over,
+            # so a later write can never fall before a date we handed out.
+            last_modified = min(
+                math.ceil(self.last_modified.timestamp()), int(time.time()))
+        return f'"{digest}"', last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            etags = {tag.strip() for tag in if_none_match.split(',')}
+            return etag in etags or '*' in etags
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return (
+            if_modified_since is not None
+            and self.last_modified is not None
+            and self.last_modified.timestamp() < if_modified_since
+        )
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.render_list, *args, **kwargs)
+
+    def render_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs)
+
+
+class CachedListMixin(ConditionalGetMixin):
+    """Caches rendered list pages for anonymous users.
+
+    The key includes the resource versions, so any write to a listed
+    resource makes the old entries unreachable, and the scheme and host,
+    which the pagination links are built from.
+    """
+
+    def get_cache_key(self, request):
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        key = '|'.join((
+            self.versions_key, request.scheme, request.get_host(),
+            request.accepted_renderer.format, params))
+        return 'list:{}:{}'.format(
+            self.basename, hashlib.md5(key.encode()).hexdigest())
+
+    def render_list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().render_list(request, *args, **kwargs)
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = self.finalize_response(
+            request, super().render_list(request, *args, **kwargs),
+            *args, **kwargs
+        )
+        response.render()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, (response.content, response['Content-Type']))
+        return response
@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class TitleCursorPagination(CursorPagination):
+    ordering = '-id'
+
+
+class AuthorReviewsPagination(CursorPagination):
+    ordering = '-pub_date'
+
+
+class TitlePagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    cursor_pagination_class = TitleCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.cursor_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
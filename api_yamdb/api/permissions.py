@@ -26,6 +26,18 @@ class AdminPermission(BasePermission):
             return True
 
 
+class AdminModeratorPermission(BasePermission):
+
+    def has_permission(self, request, view):
+        return (
+            request.user.is_authenticated
+            and (
+                request.user.is_superuser
+                or request.user.role in (UserRole.MODERATOR, UserRole.ADMIN)
+            )
+        )
+
+
 class MeUserPermission(BasePermission):
 
     def has_permission(self, request, view):
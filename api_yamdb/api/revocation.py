@@ -0,0 +1,208 @@
+import hashlib
+import math
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from reviews.models import RevokedToken, UserTokenRevocation
+
+from .stores import (
+    database_identity, file_lock, file_stamp, remove_file, replace_file)
+
+STORE_MAGIC = b'YRV2'
+STORE_HEADER = struct.Struct('>4s8sIII')
+STORE_CUTOFF = struct.Struct('>Qd')
+ISSUED_AT_CLAIM = 'issued_at'
+
+
+def tokens_for_user(user):
+    """Refresh token whose access tokens carry a sub-second issue time."""
+    refresh = RefreshToken.for_user(user)
+    refresh[ISSUED_AT_CLAIM] = time.time()
+    return refresh
+
+
+def issued_before(token, cutoff):
+    issued_at = token.get(ISSUED_AT_CLAIM)
+    if issued_at is not None:
+        return issued_at <= cutoff
+    # Whole-second iat: a token from the revocation second counts as revoked.
+    return token.get('iat', 0) <= cutoff
+
+
+class BloomFilter:
+    """Bit array with `hashes` positions per key from double hashing."""
+
+    def __init__(self, size, hashes, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        capacity = max(capacity, 1)
+        size = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(key)
+        )
+
+
+class RevocationStore:
+    """Revoked tokens as seen by this process.
+
+    The database holds the exact records. The store keeps a Bloom filter of
+    revoked jti values and the exact "revoke all" cutoffs of users in
+    memory, loaded from a file every writer rewrites atomically, so that
+    each request is checked without touching the database unless the
+    filter reports a possible match. A file written for another database
+    is never loaded; the store is rebuilt over it instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._cutoffs = {}
+            self._stamp = None
+            self._checked = None
+
+    @property
+    def path(self):
+        return settings.TOKEN_REVOCATION_PATH
+
+    def is_revoked(self, token):
+        self.sync()
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        cutoff = self._cutoffs.get(user_id)
+        if cutoff is not None and issued_before(token, cutoff):
+            return True
+        jti = token.get(api_settings.JTI_CLAIM)
+        return (
+            jti is not None
+            and jti in self._filter
+            and RevokedToken.objects.filter(jti=jti).exists()
+        )
+
+    def revoke_token(self, token, user):
+        RevokedToken.objects.get_or_create(
+            jti=token[api_settings.JTI_CLAIM],
+            defaults={
+                'user': user,
+                'expires_at': datetime_from_epoch(token['exp']),
+            }
+        )
+        transaction.on_commit(self.rebuild)
+
+    def revoke_user(self, user):
+        UserTokenRevocation.objects.update_or_create(
+            user=user, defaults={'revoked_at': timezone.now()})
+        transaction.on_commit(self.rebuild)
+
+    def sync(self):
+        now = time.monotonic()
+        if (
+            self._filter is not None
+            and now - self._checked < settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        ):
+            return
+        stamp = file_stamp(self.path)
+        if stamp is None:
+            self.rebuild()
+            return
+        if stamp != self._stamp:
+            with open(self.path, 'rb') as store:
+                data = store.read()
+            if not self.load(data, stamp):
+                self.rebuild()
+                return
+        self._checked = now
+
+    def load(self, data, stamp):
+        """Load a store file; False if it was not written for this database."""
+        if len(data) < STORE_HEADER.size:
+            return False
+        magic, identity, size, hashes, count = STORE_HEADER.unpack_from(data)
+        if magic != STORE_MAGIC or identity != database_identity():
+            return False
+        offset = STORE_HEADER.size
+        bits_end = offset + (size + 7) // 8
+        bloom = BloomFilter(size, hashes, bytearray(data[offset:bits_end]))
+        cutoffs = dict(
+            STORE_CUTOFF.unpack_from(data, bits_end + i * STORE_CUTOFF.size)
+            for i in range(count)
+        )
+        with self._lock:
+            self._filter = bloom
+            self._cutoffs = cutoffs
+            self._stamp = stamp
+            self._checked = time.monotonic()
+        return True
+
+    def rebuild(self):
+        """Rewrite the store file from the database and reload it."""
+        with file_lock(self.path):
+            now = timezone.now()
+            RevokedToken.objects.filter(expires_at__lte=now).delete()
+            lifetime = max(
+                api_settings.ACCESS_TOKEN_LIFETIME,
+                api_settings.REFRESH_TOKEN_LIFETIME
+            )
+            UserTokenRevocation.objects.filter(
+                revoked_at__lte=now - lifetime).delete()
+            jtis = list(RevokedToken.objects.values_list('jti', flat=True))
+            cutoffs = [
+                (user_id, revoked_at.timestamp())
+                for user_id, revoked_at
+                in UserTokenRevocation.objects.values_list(
+                    'user_id', 'revoked_at')
+            ]
+            bloom = BloomFilter.for_capacity(
+                max(settings.TOKEN_REVOCATION_CAPACITY, 2 * len(jtis)),
+                settings.TOKEN_REVOCATION_ERROR_RATE
+            )
+            for jti in jtis:
+                bloom.add(jti)
+            data = b''.join([
+                STORE_HEADER.pack(
+                    STORE_MAGIC, database_identity(), bloom.size,
+                    bloom.hashes, len(cutoffs)
+                ),
+                bytes(bloom.bits),
+                *(STORE_CUTOFF.pack(*cutoff) for cutoff in cutoffs),
+            ])
+            replace_file(self.path, data)
+            self.load(data, file_stamp(self.path))
+
+
+revocation_store = RevocationStore()
+
+
+def reset_revocation_store(**kwargs):
+    remove_file(settings.TOKEN_REVOCATION_PATH)
+    revocation_store.reset()
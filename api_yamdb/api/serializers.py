@@ -1,32 +1,70 @@
 import re
 import datetime as dt
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.relations import SlugRelatedField
+from rest_framework.settings import api_settings
 
-from reviews.models import Comment, Review, User, Genre, Category, Title
+from api.fields import BatchSlugRelatedField
+from reviews.models import (
+    Comment, Review, User, Genre, Category, Title, ResourceVersion,
+    title_name_key)
+from reviews.validators import validate_year
 
 
-class ReviewsSerializer(serializers.ModelSerializer):
+def split_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+class SparseFieldsMixin:
+    """Trims read responses to ?fields= and drops fields listed in ?omit=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self._context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        fields = split_param(request, 'fields')
+        omit = split_param(request, 'omit') or set()
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or name in omit:
+                self.fields.pop(name)
+
+
+class ReviewsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = SlugRelatedField(slug_field='username', read_only=True)
     title = serializers.SlugRelatedField(
         slug_field='name',
         read_only=True
     )
-
-    def validate(self, data):
-        request = self.context['request']
-        author = request.user
-        title_id = self.context.get('view').kwargs.get('title_id')
-        title = get_object_or_404(Title, id=title_id)
-        if (
-            request.method == 'POST'
-            and Review.objects.filter(title=title, author=author).exists()
-        ):
-            raise serializers.ValidationError(
-                'Может существовать только один отзыв!'
-            )
-        return data
+    comments_count = serializers.SerializerMethodField()
+
+    def get_comments_count(self, obj):
+        counts = self.context.get('comments_counts')
+        if counts is None:
+            return obj.comments.count()
+        return counts.get(obj.id, 0)
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            if not Review.objects.filter(
+                author=validated_data['author'],
+                title=validated_data['title']
+            ).exists():
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Может существовать только один отзыв!'
+                ]
+            })
 
     def validate_score(self, value):
         if not 1 <= value <= 10:
@@ -38,7 +76,16 @@ class ReviewsSerializer(serializers.ModelSerializer):
         model = Review
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class AuthorReviewSerializer(serializers.ModelSerializer):
+    title_id = serializers.IntegerField(read_only=True)
+    title = serializers.SlugRelatedField(slug_field='name', read_only=True)
+
+    class Meta:
+        fields = ('id', 'title_id', 'title', 'text', 'pub_date', 'score')
+        model = Review
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     review = serializers.SlugRelatedField(
         slug_field='text',
         read_only=True
@@ -52,6 +99,10 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
 
 
+class CompactCommentSerializer(CommentSerializer):
+    review = serializers.PrimaryKeyRelatedField(read_only=True)
+
+
 class RegistrationSerializer(serializers.Serializer):
     username = serializers.CharField(required=True)
     email = serializers.EmailField(required=True)
@@ -84,7 +135,8 @@ class LoginSerializer(serializers.Serializer):
         fields = ['username', 'confirmation_code']
 
 
-class ValidateSlugNameSerializer(serializers.ModelSerializer):
+class ValidateSlugNameSerializer(
+        SparseFieldsMixin, serializers.ModelSerializer):
     def validate_slug(self, value):
         if (
             re.match('^[-a-zA-Z0-9_]+$', value) is not None and len(value) < 51
@@ -115,16 +167,16 @@ class CategorySerializer(ValidateSlugNameSerializer):
 
 
 class TitlesPostSerializer(serializers.ModelSerializer):
-    genre = serializers.SlugRelatedField(
+    genre = BatchSlugRelatedField(
         queryset=Genre.objects.all(),
         slug_field='slug',
         many=True)
-    category = serializers.SlugRelatedField(
+    category = BatchSlugRelatedField(
         queryset=Category.objects.all(),
         slug_field='slug')
 
     class Meta:
-        fields = '__all__'
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
         model = Title
 
     def validate_year(self, value):
@@ -135,18 +187,203 @@ class TitlesPostSerializer(serializers.ModelSerializer):
         return value
 
 
-class TitlesGetSerializer(serializers.ModelSerializer):
+class TitlesBulkSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and (
+                len(data) > settings.TITLES_BULK_MAX_ITEMS):
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    f'Не больше {settings.TITLES_BULK_MAX_ITEMS} '
+                    f'произведений за один запрос'
+                ]
+            })
+        if not isinstance(data, list) or not data:
+            return super().to_internal_value(data)
+        items, errors = [], []
+        for raw in data:
+            try:
+                items.append(self.child.run_validation(raw))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                items.append(None)
+                errors.append(dict(exc.detail))
+        checked = [
+            item if item is not None else self.get_valid_fields(raw, error)
+            for item, raw, error in zip(items, data, errors)
+        ]
+        genres, categories = self.check_batch(checked, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in items:
+            item['genre_ids'] = [genres[slug] for slug in item['genre']]
+            item['category_id'] = categories[item['category']]
+        return items
+
+    def get_valid_fields(self, raw, errors):
+        """Values of the batch-checked fields that passed on their own."""
+        if not isinstance(raw, dict):
+            return {}
+        return {
+            field: raw[field] for field in ('name', 'genre', 'category')
+            if field in raw and field not in errors
+        }
+
+    def check_batch(self, items, errors):
+        """Checks slugs and names of all items with one query per table."""
+        genres = dict(Genre.objects.filter(slug__in={
+            slug for item in items for slug in item.get('genre', ())
+        }).values_list('slug', 'id'))
+        categories = dict(Category.objects.filter(slug__in={
+            item['category'] for item in items if 'category' in item
+        }).values_list('slug', 'id'))
+        taken = set(Title.objects.filter(
+            name__in=[item['name'] for item in items if 'name' in item]
+        ).values_list('name', flat=True))
+        for item, item_errors in zip(items, errors):
+            unknown = [
+                slug for slug in item.get('genre', ()) if slug not in genres]
+            if unknown:
+                item_errors['genre'] = [
+                    f'Жанры не найдены: {", ".join(unknown)}']
+            if 'category' in item and item['category'] not in categories:
+                item_errors['category'] = ['Категория не найдена']
+            if 'name' in item:
+                if item['name'] in taken:
+                    item_errors['name'] = [
+                        'Произведение с таким названием уже существует']
+                taken.add(item['name'])
+        return genres, categories
+
+    @transaction.atomic
+    def create(self, validated_data):
+        Title.objects.bulk_create(
+            Title(
+                name=item['name'],
+                name_key=title_name_key(item['name']),
+                year=item.get('year'),
+                description=item.get('description'),
+                category_id=item['category_id'],
+            )
+            for item in validated_data
+        )
+        ids = dict(Title.objects.filter(
+            name__in=[item['name'] for item in validated_data]
+        ).values_list('name', 'id'))
+        Title.genre.through.objects.bulk_create(
+            Title.genre.through(title_id=ids[item['name']], genre_id=genre_id)
+            for item in validated_data
+            for genre_id in set(item['genre_ids'])
+        )
+        ResourceVersion.bump('titles')
+        return [
+            dict(item, id=ids[item['name']]) for item in validated_data
+        ]
+
+
+class TitlesBulkItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(max_length=256)
+    year = serializers.IntegerField(
+        required=False, allow_null=True, validators=[validate_year])
+    description = serializers.CharField(
+        max_length=512, required=False, allow_blank=True, allow_null=True)
+    genre = serializers.ListField(child=serializers.SlugField())
+    category = serializers.SlugField()
+
+    class Meta:
+        list_serializer_class = TitlesBulkSerializer
+
+
+class TitleReviewSerializer(serializers.ModelSerializer):
+    author = SlugRelatedField(slug_field='username', read_only=True)
+
+    class Meta:
+        fields = ('id', 'author', 'text', 'pub_date', 'score')
+        model = Review
+
+
+class TitlesGetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     genre = GenreSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
-    rating = serializers.IntegerField()
+    rating = serializers.IntegerField(read_only=True)
 
     class Meta():
-        fields = '__all__'
+        fields = (
+            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
+        )
         read_only_fields = ('id',)
         model = Title
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        reviews = self.context.get('expanded_reviews')
+        if reviews is not None:
+            data['reviews'] = reviews.get(instance.id, [])
+        return data
+
+
+class TitlesTopSerializer(TitlesGetSerializer):
+    weighted_rating = serializers.FloatField(read_only=True)
+
+    class Meta(TitlesGetSerializer.Meta):
+        fields = TitlesGetSerializer.Meta.fields + ('weighted_rating',)
+
+
+class TopTitlesQuerySerializer(serializers.Serializer):
+    category = serializers.SlugField(required=False)
+    genre = serializers.SlugField(required=False)
+    limit = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.TOP_TITLES_MAX_LIMIT,
+        default=settings.TOP_TITLES_LIMIT
+    )
+
+
+class CommentsQuerySerializer(serializers.Serializer):
+    since_id = serializers.IntegerField(required=False)
+    since = serializers.DateTimeField(required=False)
+    wait = serializers.FloatField(
+        required=False,
+        min_value=0,
+        max_value=settings.COMMENTS_LONG_POLL_MAX_WAIT,
+        default=0
+    )
+
+    def validate(self, data):
+        if data['wait'] and 'since_id' not in data and 'since' not in data:
+            raise serializers.ValidationError(
+                'Ожидание новых комментариев возможно только '
+                'вместе с since_id или since')
+        return data
+
 
-class UsersSerializer(serializers.ModelSerializer):
+class ExpandSerializer(serializers.Serializer):
+    expand = serializers.CharField(required=False)
+
+    def validate_expand(self, value):
+        expand = {}
+        for item in filter(None, (part.strip() for part in value.split(','))):
+            name, _, size = item.partition(':')
+            if name in ('category', 'genre') and not size:
+                continue
+            if name != 'reviews':
+                raise serializers.ValidationError(
+                    f'Нельзя раскрыть поле {name}')
+            if not size:
+                size = settings.TITLE_EXPAND_REVIEWS
+            elif not size.isdigit() or not (
+                    0 < int(size) <= settings.TITLE_EXPAND_REVIEWS_MAX):
+                raise serializers.ValidationError(
+                    f'Количество отзывов должно быть от 1 до '
+                    f'{settings.TITLE_EXPAND_REVIEWS_MAX}'
+                )
+            expand[name] = int(size)
+        return expand
+
+
+class UsersSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = (
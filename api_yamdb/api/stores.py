@@ -0,0 +1,57 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def database_identity():
+    """Digest of the database whose state a store file describes."""
+    database = connections[DEFAULT_DB_ALIAS].settings_dict
+    key = '|'.join(
+        str(database[name]) for name in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+
+def file_stamp(path):
+    """Identifies a file version written by `replace_file`, or None."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def replace_file(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def file_lock(path):
+    """Serializes writers of `path` across processes where flock exists."""
+    if fcntl is None:
+        yield
+        return
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
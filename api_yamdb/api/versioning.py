@@ -0,0 +1,11 @@
+from rest_framework.versioning import AcceptHeaderVersioning
+
+COMMENTS_FULL = '1'
+COMMENTS_COMPACT = '2'
+
+
+class CommentVersioning(AcceptHeaderVersioning):
+    """`Accept: application/json; version=2` selects compact comments."""
+
+    default_version = COMMENTS_FULL
+    allowed_versions = (COMMENTS_FULL, COMMENTS_COMPACT)
@@ -1,10 +1,14 @@
 from rest_framework import viewsets, mixins, filters
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Avg
+from django.utils.cache import patch_vary_headers
+from django.utils.text import Truncator
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from rest_framework import filters
 from rest_framework.pagination import LimitOffsetPagination
 from django_filters.rest_framework import DjangoFilterBackend
@@ -13,61 +17,156 @@ from django.core.mail import send_mail
 from rest_framework.decorators import action
 from rest_framework.decorators import api_view, permission_classes
 
-from reviews.models import Review, Title, User, Genre, Category
+from reviews.models import (
+    Comment, Review, Title, User, Genre, Category, ScoreCount)
+from reviews.notifications import comment_notifier
 from api.serializers import (
+    AuthorReviewSerializer,
     CommentSerializer,
+    CommentsQuerySerializer,
+    CompactCommentSerializer,
+    ExpandSerializer,
+    TitleReviewSerializer,
     ReviewsSerializer,
     RegistrationSerializer,
     UsersSerializer,
     LoginSerializer,
     GenreSerializer,
     CategorySerializer,
+    TitlesBulkItemSerializer,
     TitlesGetSerializer,
+    TitlesTopSerializer,
+    TopTitlesQuerySerializer,
     UsersMeSerializer,
     TitlesPostSerializer
 )
 from api.permissions import (
+    AdminModeratorPermission,
     AdminAuthorOrReadOnly,
     AdminPermission,
     AdminOrReadOnly,
     AdminModeratorAuthorPermission,
 )
-from .filters import TitleFilter
+from .filters import CommentFilter, TitleFilter
+from .imports import NdjsonImporter
+from .fast_serializers import (
+    FastReviewListSerializer, FastTitleListSerializer
+)
+from .mixins import (
+    CachedListMixin,
+    ConditionalGetMixin,
+    ConditionalRetrieveMixin,
+    FastListMixin,
+    SparseFieldsViewMixin,
+)
+from .pagination import AuthorReviewsPagination, TitlePagination
+from .revocation import revocation_store, tokens_for_user
+from .versioning import COMMENTS_COMPACT, CommentVersioning
 
 
-class ReviewsViewSet(viewsets.ModelViewSet):
+class ReviewsViewSet(
+        SparseFieldsViewMixin,
+        FastListMixin,
+        viewsets.ModelViewSet
+):
     serializer_class = ReviewsSerializer
+    fast_list_serializer_class = FastReviewListSerializer
     permission_classes = [
         AdminModeratorAuthorPermission
     ]
 
     def get_title(self):
-        title = get_object_or_404(Title, id=self.kwargs.get("title_id"))
-        return title
+        if not hasattr(self, 'title'):
+            self.title = get_object_or_404(
+                Title, id=self.kwargs.get("title_id"))
+        return self.title
 
     def get_queryset(self):
         title = self.get_title()
-        queryset = title.reviews.order_by('id')
+        queryset = title.reviews.select_related('author').order_by('id')
         return queryset
 
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.method == 'GET':
+            reviews = args[0] if kwargs.get('many') else [args[0]]
+            kwargs['context'] = dict(
+                self.get_serializer_context(),
+                comments_counts=Comment.objects.count_by_review(
+                    [review.id for review in reviews])
+            )
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        self.get_title()
+        return super().create(request, *args, **kwargs)
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        title = self.get_title()
-        serializer.save(author=self.request.user, title=title)
+        serializer.save(author=self.request.user, title=self.get_title())
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
 
-class CommentsViewSet(viewsets.ModelViewSet):
+class CommentsViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [
         AdminModeratorAuthorPermission
     ]
+    filterset_class = CommentFilter
+    versioning_class = CommentVersioning
 
     def get_review(self):
-        review = get_object_or_404(Review, id=self.kwargs.get("review_id"))
-        return review
+        if not hasattr(self, 'review'):
+            self.review = get_object_or_404(
+                Review,
+                id=self.kwargs.get("review_id"),
+                title_id=self.kwargs.get("title_id")
+            )
+        return self.review
 
     def get_queryset(self):
         review = self.get_review()
-        return review.comments.all()
+        return review.comments.select_related('author')
+
+    def is_compact(self):
+        return self.request.version == COMMENTS_COMPACT
+
+    def get_serializer_class(self):
+        if self.is_compact():
+            return CompactCommentSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        params = CommentsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        wait = params.validated_data['wait']
+        if wait:
+            queryset = self.filter_queryset(self.get_queryset())
+            comment_notifier.wait_until(
+                self.get_review().id, queryset.exists, wait,
+                settings.COMMENTS_LONG_POLL_CHECK_INTERVAL
+            )
+        response = super().list(request, *args, **kwargs)
+        if self.is_compact() and isinstance(response.data, dict):
+            review = self.get_review()
+            response.data['review'] = {
+                'id': review.id,
+                'excerpt': Truncator(review.text).chars(
+                    settings.COMMENT_REVIEW_EXCERPT_LENGTH),
+            }
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        patch_vary_headers(response, ('Accept',))
+        return response
 
     def perform_create(self, serializer):
         review = self.get_review()
@@ -83,7 +182,7 @@ def send_code(user):
     )
 
 
-class UsersViewSet(viewsets.ModelViewSet):
+class UsersViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UsersSerializer
     permission_classes = [AdminPermission, ]
@@ -108,6 +207,32 @@ class UsersViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def author_reviews(self, request, author_id):
+        queryset = Review.objects.filter(
+            author_id=author_id
+        ).select_related('title').only(
+            'id', 'text', 'pub_date', 'score', 'title__id', 'title__name')
+        paginator = AuthorReviewsPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = AuthorReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['POST'], url_path='revoke-tokens')
+    def revoke_tokens(self, request, username=None):
+        revocation_store.revoke_user(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, url_path='reviews',
+            permission_classes=(AdminModeratorPermission,))
+    def reviews(self, request, username=None):
+        author = get_object_or_404(User.objects.only('id'), username=username)
+        return self.author_reviews(request, author.id)
+
+    @action(detail=False, url_path='me/reviews',
+            permission_classes=(IsAuthenticated,))
+    def me_reviews(self, request):
+        return self.author_reviews(request, request.user.id)
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -139,7 +264,7 @@ def token(request):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
-    refresh = RefreshToken.for_user(user)
+    refresh = tokens_for_user(user)
     return Response({
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -147,7 +272,25 @@ def token(request):
         status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    revocation_store.revoke_token(request.auth, request.user)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([AdminPermission])
+def import_ndjson(request):
+    return StreamingHttpResponse(
+        NdjsonImporter(request.stream or []),
+        content_type='application/x-ndjson'
+    )
+
+
 class DeleteCreateListGenericViewSet(
+        SparseFieldsViewMixin,
+        ConditionalGetMixin,
         mixins.CreateModelMixin,
         mixins.DestroyModelMixin,
         mixins.ListModelMixin,
@@ -161,25 +304,101 @@ class DeleteCreateListGenericViewSet(
 
 class GenreViewSet(DeleteCreateListGenericViewSet):
     queryset = Genre.objects.all()
+    version_resources = ('genres',)
     serializer_class = GenreSerializer
     permission_classes = (AdminOrReadOnly,)
 
 
 class CategoryViewSet(DeleteCreateListGenericViewSet):
     queryset = Category.objects.all()
+    version_resources = ('categories',)
     serializer_class = CategorySerializer
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')).order_by('-id')
+class TitleViewSet(
+        SparseFieldsViewMixin,
+        CachedListMixin,
+        ConditionalRetrieveMixin,
+        FastListMixin,
+        viewsets.ModelViewSet
+):
+    queryset = Title.objects.select_related('category').prefetch_related(
+        'genre').order_by('-id')
+    version_resources = ('titles', 'genres', 'categories')
     serializer_class = TitlesGetSerializer
+    fast_list_serializer_class = FastTitleListSerializer
     permission_classes = (AdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_fields = ('category', 'genre', 'name', 'year')
     filterset_class = TitleFilter
+    pagination_class = TitlePagination
+
+    @action(detail=False, url_path='suggest')
+    def suggest(self, request):
+        return Response(Title.objects.suggest(
+            request.query_params.get('q', ''), settings.TITLE_SUGGEST_LIMIT))
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        serializer = TitlesBulkItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, url_path='stats')
+    def stats(self, request, pk=None):
+        title = get_object_or_404(Title.objects.only('id'), pk=pk)
+        return Response(ScoreCount.objects.stats(title.id))
+
+    @action(detail=False, url_path='top')
+    def top(self, request):
+        params = TopTitlesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+        titles = self.get_queryset().filter(
+            reviews_count__gt=0
+        ).order_by('-weighted_rating', '-id')
+        if 'category' in params:
+            titles = titles.filter(category__slug=params['category'])
+        if 'genre' in params:
+            titles = titles.filter(id__in=Title.genre.through.objects.filter(
+                genre__slug=params['genre']).values('title_id'))
+        serializer = self.get_serializer(titles[:params['limit']], many=True)
+        return Response(serializer.data)
+
+    def get_expand(self):
+        serializer = ExpandSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('expand', {})
+
+    def get_expanded_reviews(self, titles, size):
+        title_ids = [title.id for title in titles]
+        latest = Review.objects.filter(
+            title_id=OuterRef('title_id')
+        ).order_by('-id').values('id')[:size]
+        reviews = Review.objects.filter(
+            title_id__in=title_ids, id__in=Subquery(latest)
+        ).select_related('author').order_by('title_id', '-id')
+        expanded = {title_id: [] for title_id in title_ids}
+        for review in reviews:
+            expanded[review.title_id].append(
+                TitleReviewSerializer(review).data)
+        return expanded
+
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.method == 'GET':
+            size = self.get_expand().get('reviews')
+            if size:
+                titles = args[0] if kwargs.get('many') else [args[0]]
+                kwargs['context'] = dict(
+                    self.get_serializer_context(),
+                    expanded_reviews=self.get_expanded_reviews(titles, size)
+                )
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH',):
             return TitlesPostSerializer
+        if self.action == 'top':
+            return TitlesTopSerializer
         return TitlesGetSerializer
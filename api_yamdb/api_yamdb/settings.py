@@ -1,4 +1,6 @@
 import os
+import hashlib
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -26,8 +28,8 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'django_filters',
-    'api',
-    'reviews',
+    'api.apps.ApiConfig',
+    'reviews.apps.ReviewsConfig',
     'rest_framework_simplejwt',
 ]
 
@@ -73,6 +75,28 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -115,7 +139,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -124,6 +148,45 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+FAST_LIST_SERIALIZATION = os.getenv(
+    'FAST_LIST_SERIALIZATION', 'False') == 'True'
+
+TITLE_SUGGEST_LIMIT = 10
+TITLE_SUGGEST_CANDIDATES = 200
+TITLES_BULK_MAX_ITEMS = 1000
+TITLE_EXPAND_REVIEWS = 3
+TITLE_EXPAND_REVIEWS_MAX = 20
+IMPORT_BATCH_SIZE = 500
+
+TOP_TITLES_PRIOR_WEIGHT = 25
+TOP_TITLES_LIMIT = 10
+TOP_TITLES_MAX_LIMIT = 100
+
+COMMENTS_LONG_POLL_MAX_WAIT = 30
+COMMENTS_LONG_POLL_CHECK_INTERVAL = 1
+COMMENT_REVIEW_EXCERPT_LENGTH = 100
+
+# Files shared by the worker processes of one deployment. The name carries
+# a digest of the database path, so deployments on one host never share them.
+AUTH_STORES_PREFIX = os.path.join(
+    tempfile.gettempdir(),
+    'api_yamdb_' + hashlib.md5(
+        str(DATABASES['default']['NAME']).encode()).hexdigest()[:12]
+)
+
+JWT_AUTH_CACHE_SIZE = 1024
+JWT_AUTH_CACHE_TTL = 60
+JWT_AUTH_SYNC_INTERVAL = 1
+JWT_AUTH_INVALIDATION_LOG_SIZE = 1024
+JWT_AUTH_INVALIDATION_PATH = os.getenv(
+    'JWT_AUTH_INVALIDATION_PATH', f'{AUTH_STORES_PREFIX}_user_invalidations.bin')
+
+TOKEN_REVOCATION_PATH = os.getenv(
+    'TOKEN_REVOCATION_PATH', f'{AUTH_STORES_PREFIX}_revoked_tokens.bin')
+TOKEN_REVOCATION_CAPACITY = 100000
+TOKEN_REVOCATION_ERROR_RATE = 0.001
+TOKEN_REVOCATION_SYNC_INTERVAL = 1
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=100),
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        from .fts import create_title_fts_triggers
+        from .signals import connect_signals
+        post_migrate.connect(create_title_fts_triggers, sender=self)
+        connect_signals()
@@ -1,9 +1,10 @@
 import csv
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, call_command
 
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.models import (
+    Category, Comment, Genre, ResourceVersion, Review, Title, User)
 
 TABLES = {
     Category: 'category.csv',
@@ -28,3 +29,6 @@ class Command(BaseCommand):
                 reader = csv.DictReader(csv_file)
                 model.objects.bulk_create(
                     model(**data) for data in reader)
+        Title.objects.refresh_name_keys()
+        ResourceVersion.bump('genres', 'categories')
+        call_command('recount_ratings')
@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand, call_command
+from django.db import transaction
+from django.db.models import Count
+
+from reviews.models import (
+    ResourceVersion, Review, ScoreCount, Title, recount_ratings)
+
+
+class Command(BaseCommand):
+    help = "Recounts stored title ratings and score histograms from reviews."
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        updated = recount_ratings(Title.objects.all(), Review.objects)
+        ScoreCount.objects.all().delete()
+        ScoreCount.objects.bulk_create(
+            ScoreCount(**row) for row in Review.objects.order_by().values(
+                'title_id', 'score').annotate(count=Count('id'))
+        )
+        ResourceVersion.bump('titles')
+        self.stdout.write(f'Пересчитан рейтинг {updated} произведений')
+        call_command('refresh_top_titles', stdout=self.stdout)
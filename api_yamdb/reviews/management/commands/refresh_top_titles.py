@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+
+from reviews.models import (
+    DEFAULT_PRIOR_SCORE, RatingPrior, ResourceVersion, Title,
+    weighted_rating)
+
+
+class Command(BaseCommand):
+    help = "Refreshes weighted title ratings used by top titles."
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        totals = Title.objects.aggregate(
+            score_sum=Sum('score_sum'), reviews_count=Sum('reviews_count')
+        )
+        score = DEFAULT_PRIOR_SCORE
+        if totals['reviews_count']:
+            score = totals['score_sum'] / totals['reviews_count']
+        RatingPrior.objects.update_or_create(id=1, defaults={'score': score})
+        updated = Title.objects.update(
+            weighted_rating=weighted_rating(
+                F('score_sum'), F('reviews_count'))
+        )
+        ResourceVersion.bump('titles')
+        self.stdout.write(
+            f'Средняя оценка {score:.2f}, обновлено {updated} произведений'
+        )
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+FTS_SQL = """
+    CREATE VIRTUAL TABLE reviews_title_fts USING fts5(
+        name, description,
+        content='reviews_title', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'{prefix}
+    )
+"""
+REBUILD_SQL = (
+    "INSERT INTO reviews_title_fts(reviews_title_fts) VALUES ('rebuild')"
+)
+
+
+def recreate_fts(prefix):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute('DROP TABLE reviews_title_fts')
+        schema_editor.execute(FTS_SQL.format(prefix=prefix))
+        schema_editor.execute(REBUILD_SQL)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_title_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            recreate_fts(", prefix='1 2 3'"), recreate_fts('')
+        ),
+    ]
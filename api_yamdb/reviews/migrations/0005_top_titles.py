@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def refresh_top_titles(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    RatingPrior = apps.get_model('reviews', 'RatingPrior')
+    totals = Title.objects.aggregate(
+        score_sum=models.Sum('score_sum'),
+        reviews_count=models.Sum('reviews_count'),
+    )
+    score = 5.5
+    if totals['reviews_count']:
+        score = totals['score_sum'] / totals['reviews_count']
+    RatingPrior.objects.create(id=1, score=score)
+    weight = settings.TOP_TITLES_PRIOR_WEIGHT
+    Title.objects.update(weighted_rating=models.ExpressionWrapper(
+        (models.F('score_sum') + score * weight)
+        / (models.F('reviews_count') + weight),
+        output_field=models.FloatField()
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_fts_prefix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingPrior',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=5.5, verbose_name='Средняя оценка всех отзывов')),
+            ],
+            options={
+                'verbose_name': 'Априорная оценка',
+                'verbose_name_plural': 'Априорные оценки',
+            },
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='weighted_rating',
+            field=models.FloatField(default=5.5, editable=False, verbose_name='Взвешенный рейтинг'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['-weighted_rating', '-id'], name='title_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', '-weighted_rating', '-id'], name='title_category_top_idx'),
+        ),
+        migrations.RunPython(refresh_top_titles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+import reviews.models
+
+
+def fill_name_keys(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    titles = list(Title.objects.only('id', 'name'))
+    for title in titles:
+        title.name_key = reviews.models.title_name_key(title.name)
+    Title.objects.bulk_update(titles, ['name_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_token_revocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='name_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=256, verbose_name='Ключ названия'),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+    ]
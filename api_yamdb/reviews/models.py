@@ -1,6 +1,15 @@
+import math
+import re
+
+from django.conf import settings
 from django.contrib.auth.models import (
     AbstractUser, BaseUserManager, PermissionsMixin)
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import (
+    Avg, Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q,
+    Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 from .validators import validate_year
@@ -112,9 +121,153 @@ class Genre(models.Model):
         return str(self.name)
 
 
+DEFAULT_PRIOR_SCORE = 5.5
+
+
+class RatingPrior(models.Model):
+    score = models.FloatField(
+        'Средняя оценка всех отзывов', default=DEFAULT_PRIOR_SCORE
+    )
+
+    class Meta:
+        verbose_name = 'Априорная оценка'
+        verbose_name_plural = 'Априорные оценки'
+
+    def __str__(self):
+        return str(self.score)
+
+
+def weighted_rating(score_sum, reviews_count):
+    weight = settings.TOP_TITLES_PRIOR_WEIGHT
+    prior = Coalesce(
+        Subquery(RatingPrior.objects.values('score')[:1]),
+        Value(DEFAULT_PRIOR_SCORE)
+    )
+    return ExpressionWrapper(
+        (prior * weight + score_sum) / (reviews_count + weight),
+        output_field=FloatField()
+    )
+
+
+def title_reviews(reviews, aggregate):
+    return Subquery(
+        reviews.filter(title=OuterRef('pk'))
+        .order_by()
+        .values('title')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+
+
+def recount_ratings(titles, reviews):
+    """Rewrite the stored rating of `titles` from `reviews` in one UPDATE."""
+    return titles.update(
+        score_sum=Coalesce(
+            title_reviews(reviews, Sum('score')), 0,
+            output_field=IntegerField()
+        ),
+        reviews_count=Coalesce(
+            title_reviews(reviews, Count('id')), 0,
+            output_field=IntegerField()
+        ),
+        rating=title_reviews(reviews, Avg('score')),
+    )
+
+
+def search_words(value):
+    return re.findall(r'\w+', value.casefold())
+
+
+def title_name_key(name):
+    return ' '.join(search_words(name))
+
+
+class TitleQuerySet(models.QuerySet):
+
+    def full_text(self, match, order_by):
+        return self.extra(
+            tables=['reviews_title_fts'],
+            where=[
+                'reviews_title_fts.rowid = reviews_title.id',
+                'reviews_title_fts MATCH %s',
+            ],
+            params=[match],
+            select={'search_rank': 'reviews_title_fts.rank'},
+            order_by=order_by,
+        )
+
+    def search(self, value):
+        words = search_words(value)
+        if not words:
+            return self
+        if connection.vendor != 'sqlite':
+            query = Q()
+            for word in words:
+                query &= Q(name__icontains=word) | Q(
+                    description__icontains=word)
+            return self.filter(query)
+        return self.full_text(
+            ' '.join(f'"{word}"' for word in words), ['search_rank'])
+
+    def suggest(self, value, limit):
+        key = title_name_key(value)
+        if not key:
+            return []
+        fields = ('id', 'name')
+        titles = list(self.filter(
+            name_key__gte=key, name_key__lt=key + '\U0010ffff'
+        ).order_by('name_key').values(*fields)[:limit])
+        if len(titles) == limit or connection.vendor != 'sqlite':
+            return titles
+        words = key.split()
+        phrases = [f'"{word}"' for word in words[:-1]]
+        phrases.append(f'"{words[-1]}"*')
+        found = {title['id'] for title in titles}
+        candidates = self.full_text(
+            'name : ({})'.format(' '.join(phrases)), []
+        ).order_by().values(*fields, 'name_key')[
+            :settings.TITLE_SUGGEST_CANDIDATES]
+        candidates = sorted(
+            (title for title in candidates if title['id'] not in found),
+            key=lambda title: title['name_key']
+        )
+        return titles + [
+            {field: title[field] for field in fields}
+            for title in candidates[:limit - len(titles)]
+        ]
+
+    def refresh_name_keys(self):
+        titles = list(self.only('id', 'name'))
+        for title in titles:
+            title.name_key = title_name_key(title.name)
+        return self.model.objects.bulk_update(
+            titles, ['name_key'], batch_size=500)
+
+    def change_rating(self, score_delta, count_delta=0):
+        score_sum = F('score_sum') + score_delta
+        reviews_count = F('reviews_count') + count_delta
+        return self.update(
+            score_sum=score_sum,
+            reviews_count=reviews_count,
+            rating=ExpressionWrapper(
+                Cast(score_sum, FloatField()) / NullIf(reviews_count, 0),
+                output_field=FloatField()
+            ),
+            weighted_rating=weighted_rating(score_sum, reviews_count)
+        )
+
+
+TITLE_RATING_FIELDS = (
+    'score_sum', 'reviews_count', 'rating', 'weighted_rating')
+
+
 class Title(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField('Жанр', max_length=256, unique=True)
+    name_key = models.CharField(
+        'Ключ названия', max_length=256, db_index=True, editable=False,
+        default=''
+    )
     year = models.IntegerField(
         'Год выхода',
         null=True,
@@ -134,15 +287,63 @@ class Title(models.Model):
         on_delete=models.SET_NULL,
         related_name='category'
     )
+    score_sum = models.PositiveIntegerField(
+        'Сумма оценок', default=0, editable=False
+    )
+    reviews_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0, editable=False
+    )
+    rating = models.FloatField(
+        'Рейтинг', null=True, blank=True, editable=False
+    )
+    weighted_rating = models.FloatField(
+        'Взвешенный рейтинг', default=DEFAULT_PRIOR_SCORE, editable=False
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['-weighted_rating', '-id'],
+                name='title_top_idx'
+            ),
+            models.Index(
+                fields=['category', '-weighted_rating', '-id'],
+                name='title_category_top_idx'
+            ),
+            models.Index(fields=['year'], name='title_year_idx'),
+            models.Index(
+                fields=['category', 'year'],
+                name='title_category_year_idx'
+            ),
+        ]
         verbose_name = "Произведение"
         verbose_name_plural = "Произведения"
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_key = title_name_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
+        elif (
+            update_fields is None
+            and not self._state.adding
+            and not kwargs.get('force_insert')
+        ):
+            # Review signals keep these columns up to date with F()
+            # increments; writing back loaded values would undo them.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in TITLE_RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Review(models.Model):
     title = models.ForeignKey(
@@ -175,12 +376,105 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['author', 'title'], name='uniq')
         ]
+        indexes = [
+            models.Index(fields=['title', 'id'], name='review_title_id_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='review_author_pub_date_idx'
+            ),
+        ]
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
 
     def __str__(self):
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        review.saved_score = review.__dict__.get('score')
+        return review
+
+
+SCORES = range(1, 11)
+
+
+def histogram_position(histogram, position):
+    seen = 0
+    for score in SCORES:
+        seen += histogram[score]
+        if seen >= position:
+            return score
+
+
+class ScoreCountQuerySet(models.QuerySet):
+
+    def change(self, title_id, score, delta):
+        scores = self.filter(title_id=title_id, score=score)
+        if scores.update(count=F('count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(title_id=title_id, score=score, count=delta)
+        except IntegrityError:
+            scores.update(count=F('count') + delta)
+
+    def stats(self, title_id):
+        histogram = dict.fromkeys(SCORES, 0)
+        histogram.update(
+            self.filter(title_id=title_id).values_list('score', 'count'))
+        count = sum(histogram.values())
+        stats = {
+            'count': count,
+            'mean': None,
+            'median': None,
+            'std_dev': None,
+            'histogram': histogram,
+        }
+        if not count:
+            return stats
+        mean = sum(score * total for score, total in histogram.items()) / count
+        stats['mean'] = mean
+        stats['median'] = (
+            histogram_position(histogram, (count + 1) // 2)
+            + histogram_position(histogram, count // 2 + 1)
+        ) / 2
+        stats['std_dev'] = math.sqrt(sum(
+            total * (score - mean) ** 2 for score, total in histogram.items()
+        ) / count)
+        return stats
+
+
+class ScoreCount(models.Model):
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE,
+        related_name='score_counts',
+        verbose_name='Произведение'
+    )
+    score = models.PositiveSmallIntegerField('Оценка')
+    count = models.PositiveIntegerField('Количество оценок', default=0)
+
+    objects = ScoreCountQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'score'], name='uniq_title_score')
+        ]
+        verbose_name = 'Количество оценок'
+        verbose_name_plural = 'Количество оценок'
+
+    def __str__(self):
+        return f'{self.score}: {self.count}'
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def count_by_review(self, review_ids):
+        return dict(self.filter(review_id__in=review_ids).order_by().values(
+            'review_id').annotate(total=models.Count('id')).values_list(
+            'review_id', 'total'))
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
@@ -201,6 +495,8 @@ class Comment(models.Model):
         auto_now_add=True,
         db_index=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Комментарий'
@@ -208,3 +504,63 @@ class Comment(models.Model):
 
     def __str__(self):
         return self.text
+
+
+class ResourceVersion(models.Model):
+    resource = models.CharField('Ресурс', max_length=50, unique=True)
+    version = models.PositiveIntegerField('Версия', default=0)
+    updated = models.DateTimeField('Дата изменения', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Версия ресурса'
+        verbose_name_plural = 'Версии ресурсов'
+
+    def __str__(self):
+        return f'{self.resource}: {self.version}'
+
+    @classmethod
+    def bump(cls, *resources):
+        now = timezone.now()
+        for resource in resources:
+            updated = cls.objects.filter(resource=resource).update(
+                version=F('version') + 1, updated=now
+            )
+            if not updated:
+                cls.objects.get_or_create(
+                    resource=resource, defaults={'version': 1, 'updated': now}
+                )
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField('Идентификатор токена', max_length=255, unique=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='revoked_tokens',
+        verbose_name='Пользователь'
+    )
+    expires_at = models.DateTimeField('Действует до', db_index=True)
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti
+
+
+class UserTokenRevocation(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='token_revocation',
+        verbose_name='Пользователь'
+    )
+    revoked_at = models.DateTimeField('Дата отзыва', db_index=True)
+
+    class Meta:
+        verbose_name = 'Отзыв токенов пользователя'
+        verbose_name_plural = 'Отзывы токенов пользователей'
+
+    def __str__(self):
+        return f'{self.user}: {self.revoked_at}'
@@ -0,0 +1,44 @@
+import threading
+import time
+
+
+class CommentNotifier:
+    """Счётчики новых комментариев по отзывам для long-poll запросов.
+
+    notify() будит ожидающих только в своём процессе, поэтому wait_until()
+    ещё и перепроверяет условие каждые `interval` секунд: так комментарии,
+    добавленные другими процессами, находятся с задержкой не больше
+    интервала.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+
+    def version(self, review_id):
+        with self._condition:
+            return self._versions.get(review_id, 0)
+
+    def notify(self, review_id):
+        with self._condition:
+            self._versions[review_id] = self._versions.get(review_id, 0) + 1
+            self._condition.notify_all()
+
+    def wait(self, review_id, version, timeout):
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._versions.get(review_id, 0) != version, timeout)
+
+    def wait_until(self, review_id, predicate, timeout, interval):
+        deadline = time.monotonic() + timeout
+        while True:
+            version = self.version(review_id)
+            if predicate():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.wait(review_id, version, min(remaining, interval))
+
+
+comment_notifier = CommentNotifier()
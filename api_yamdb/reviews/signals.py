@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_save)
+
+from .models import (
+    Category, Comment, Genre, ResourceVersion, Review, ScoreCount, Title)
+from .notifications import comment_notifier
+
+RESOURCES = {
+    Title: ('titles',),
+    Review: ('titles',),
+    Genre: ('genres',),
+    Category: ('categories',),
+}
+
+
+def bump_resource_version(sender, **kwargs):
+    ResourceVersion.bump(*RESOURCES[sender])
+
+
+def bump_title_genres_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        ResourceVersion.bump('titles')
+
+
+def remember_review_score(sender, instance, **kwargs):
+    if instance.pk is not None and getattr(
+            instance, 'saved_score', None) is None:
+        instance.saved_score = Review.objects.filter(
+            pk=instance.pk).values_list('score', flat=True).first()
+
+
+def count_saved_review(sender, instance, created, **kwargs):
+    titles = Title.objects.filter(id=instance.title_id)
+    old_score = None if created else instance.saved_score
+    if old_score is None:
+        titles.change_rating(instance.score, 1)
+        ScoreCount.objects.change(instance.title_id, instance.score, 1)
+    elif old_score != instance.score:
+        titles.change_rating(instance.score - old_score)
+        ScoreCount.objects.change(instance.title_id, old_score, -1)
+        ScoreCount.objects.change(instance.title_id, instance.score, 1)
+    instance.saved_score = instance.score
+
+
+def count_deleted_review(sender, instance, **kwargs):
+    Title.objects.filter(id=instance.title_id).change_rating(
+        -instance.score, -1)
+    ScoreCount.objects.change(instance.title_id, instance.score, -1)
+
+
+def notify_comment_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: comment_notifier.notify(instance.review_id))
+
+
+def connect_signals():
+    for model in RESOURCES:
+        post_save.connect(bump_resource_version, sender=model)
+        post_delete.connect(bump_resource_version, sender=model)
+    m2m_changed.connect(
+        bump_title_genres_version, sender=Title.genre.through)
+    pre_save.connect(remember_review_score, sender=Review)
+    post_save.connect(count_saved_review, sender=Review)
+    post_delete.connect(count_deleted_review, sender=Review)
+    post_save.connect(notify_comment_created, sender=Comment)
@@ -1,4 +1,6 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from .common import (auth_client, create_categories, create_genre,
                      create_titles, create_users_api)
@@ -249,3 +251,77 @@ class Test04TitleAPI:
         user, moderator = create_users_api(admin_client)
         self.check_permissions(user, 'обычного пользователя', titles, categories, genres)
         self.check_permissions(moderator, 'модератора', titles, categories, genres)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_titles_bulk_create(self, client, admin_client, user_client):
+        titles, categories, genres = create_titles(admin_client)
+        data = [
+            {'name': 'Первое', 'year': 1990, 'genre': [genres[0]['slug'], genres[1]['slug']],
+             'category': categories[0]['slug'], 'description': 'Описание'},
+            {'name': 'Второе', 'year': 1991, 'genre': [], 'category': categories[1]['slug']},
+        ]
+        response = user_client.post('/api/v1/titles/bulk/', data=data, format='json')
+        assert response.status_code == 403, (
+            'Проверьте, что при POST запросе `/api/v1/titles/bulk/` обычным пользователем возвращается статус 403'
+        )
+        invalid = data + [
+            {'name': titles[0]['name'], 'year': 1992, 'genre': ['unknown'], 'category': 'unknown'},
+        ]
+        response = admin_client.post('/api/v1/titles/bulk/', data=invalid, format='json')
+        assert response.status_code == 400, (
+            'Проверьте, что при POST запросе `/api/v1/titles/bulk/` с неправильными данными возвращается статус 400'
+        )
+        errors = response.json()
+        assert errors[:2] == [{}, {}] and set(errors[2]) == {'name', 'genre', 'category'}, (
+            'Проверьте, что `/api/v1/titles/bulk/` возвращает ошибки для каждого произведения'
+        )
+        response = admin_client.post('/api/v1/titles/bulk/', data=[
+            {'name': 'Третье', 'genre': ['nope'], 'category': categories[0]['slug']},
+            {'genre': [genres[0]['slug']], 'category': 'nope'},
+        ], format='json')
+        errors = response.json()
+        assert set(errors[0]) == {'genre'} and set(errors[1]) == {'name', 'category'}, (
+            'Проверьте, что `/api/v1/titles/bulk/` возвращает ошибки всех произведений одним ответом, '
+            'даже если у некоторых произведений не заполнены обязательные поля'
+        )
+        assert client.get('/api/v1/titles/').json()['count'] == 2, (
+            'Проверьте, что при ошибке в одном из произведений не создаётся ни одно'
+        )
+        response = admin_client.post('/api/v1/titles/bulk/', data=data, format='json')
+        assert response.status_code == 201, (
+            'Проверьте, что при POST запросе `/api/v1/titles/bulk/` с правильными данными возвращается статус 201'
+        )
+        created = response.json()
+        assert [title['name'] for title in created] == ['Первое', 'Второе'] and all(
+            type(title['id']) == int for title in created
+        )
+        response = client.get(f'/api/v1/titles/{created[0]["id"]}/')
+        assert {genre['slug'] for genre in response.json()['genre']} == {genres[0]['slug'], genres[1]['slug']}, (
+            'Проверьте, что `/api/v1/titles/bulk/` сохраняет жанры произведений'
+        )
+        assert client.get('/api/v1/titles/').json()['count'] == 4
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_titles_genre_slugs_single_query(self, admin_client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        data = {'name': 'Все жанры', 'year': 2000, 'category': categories[0]['slug'],
+                'genre': [genre['slug'] for genre in genres]}
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post('/api/v1/titles/', data=data)
+        assert response.status_code == 201
+        genre_queries = [
+            query for query in queries
+            if '"reviews_genre"."slug" IN' in query['sql'] or '"reviews_genre"."slug" =' in query['sql']
+        ]
+        assert len(genre_queries) == 1, (
+            'Проверьте, что жанры произведения ищутся по slug одним запросом'
+        )
+        data['name'] = 'Неизвестные жанры'
+        data['genre'] = [genres[0]['slug'], 'unknown', 'missing']
+        response = admin_client.post('/api/v1/titles/', data=data)
+        assert response.status_code == 400
+        errors = response.json()['genre']
+        assert len(errors) == 1 and 'unknown' in errors[0] and 'missing' in errors[0], (
+            'Проверьте, что все неизвестные жанры перечислены в одной ошибке'
+        )
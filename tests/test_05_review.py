@@ -1,4 +1,8 @@
 import pytest
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Review
 
 from .common import (auth_client, create_reviews, create_titles,
                      create_users_api)
@@ -334,3 +338,75 @@ class Test05ReviewAPI:
             'без токена авторизации возвращается статус 401'
         )
         self.check_permissions(user, 'обычного пользователя', reviews, titles)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_review_create_queries(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(url, data={'text': 'Текст', 'score': 5})
+        assert response.status_code == 201
+        title_queries = [query for query in queries if query['sql'].startswith('SELECT "reviews_title"')]
+        review_queries = [query for query in queries if 'FROM "reviews_review"' in query['sql']]
+        assert len(title_queries) == 1 and not review_queries, (
+            'Проверьте, что при создании отзыва произведение загружается один раз, '
+            'а повторный отзыв определяется ограничением уникальности'
+        )
+        response = admin_client.post(url, data={'text': 'Ещё', 'score': 6})
+        assert response.status_code == 400 and 'non_field_errors' in response.json()
+        response = admin_client.post('/api/v1/titles/100500/reviews/', data={'text': 'Текст', 'score': 5})
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_reviews_list_constant_queries(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        admin_client.post(f'/api/v1/titles/{titles[1]["id"]}/reviews/', data={'text': 'Текст', 'score': 5})
+        with CaptureQueriesContext(connection) as few:
+            client.get(f'/api/v1/titles/{titles[1]["id"]}/reviews/')
+        with CaptureQueriesContext(connection) as many:
+            response = client.get(url)
+        assert len(response.json()['results']) == len(reviews)
+        assert len(many) == len(few), (
+            'Проверьте, что количество запросов к БД при GET запросе `/api/v1/titles/{title_id}/reviews/` '
+            'не зависит от количества отзывов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_reviews_by_author(self, client, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        admin_client.post(f'/api/v1/titles/{titles[1]["id"]}/reviews/', data={'text': 'Второй', 'score': 8})
+        url = f'/api/v1/users/{admin.username}/reviews/'
+        assert client.get(url).status_code == 401
+        assert auth_client(user).get(url).status_code == 403, (
+            'Проверьте, что отзывы другого пользователя доступны только модератору и администратору'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client(moderator).get(url)
+        assert response.status_code == 200
+        data = response.json()
+        assert 'count' not in data and 'next' in data, (
+            'Проверьте, что отзывы автора выводятся с постраничным выводом по курсору'
+        )
+        assert [(review['title_id'], review['title']) for review in data['results']] == [
+            (titles[1]['id'], titles[1]['name']), (titles[0]['id'], titles[0]['name'])
+        ], (
+            'Проверьте, что отзывы автора упорядочены по убыванию даты и содержат id и название произведения'
+        )
+        assert len([query for query in queries if 'FROM "reviews_title"' in query['sql']]) == 0
+        response = auth_client(user).get('/api/v1/users/me/reviews/')
+        assert [review['id'] for review in response.json()['results']] == [reviews[1]['id']], (
+            'Проверьте, что `/api/v1/users/me/reviews/` возвращает отзывы текущего пользователя'
+        )
+        assert admin_client.get('/api/v1/users/nobody/reviews/').status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_review_unrelated_integrity_error(self, admin_client, admin, monkeypatch):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+
+        def fail_save(*args, **kwargs):
+            raise IntegrityError('NOT NULL constraint failed')
+
+        monkeypatch.setattr(Review, 'save', fail_save)
+        with pytest.raises(IntegrityError):
+            admin_client.post(f'/api/v1/titles/{titles[1]["id"]}/reviews/', data={'text': 'Текст', 'score': 5})
@@ -1,4 +1,10 @@
+import threading
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.notifications import CommentNotifier, comment_notifier
 
 from .common import auth_client, create_comments, create_reviews
 
@@ -246,3 +252,99 @@ class Test06CommentAPI:
             'без токена авторизации возвращается статус 401'
         )
         self.check_permissions(user, 'обычного пользователя', f'{pre_url}{comments[2]["id"]}/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_comments_scoped_and_counted(self, client, admin_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(admin_client, admin)
+        response = client.get(f'/api/v1/titles/{titles[1]["id"]}/reviews/{reviews[0]["id"]}/comments/')
+        assert response.status_code == 404, (
+            'Проверьте, что комментарии отзыва доступны только по адресу его произведения'
+        )
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert len(response.json()['results']) == len(comments)
+        assert len(queries) == 3, (
+            'Проверьте, что список комментариев загружается постоянным числом запросов'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/')
+        counts = {review['id']: review['comments_count'] for review in response.json()['results']}
+        assert counts == {reviews[0]['id']: 3, reviews[1]['id']: 0, reviews[2]['id']: 0}, (
+            'Проверьте, что в списке отзывов возвращается `comments_count`'
+        )
+        assert len([query for query in queries if 'FROM "reviews_comment"' in query['sql']]) == 1, (
+            'Проверьте, что `comments_count` считается одним запросом для всей страницы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_comments_since(self, client, admin_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        response = client.get(f'{url}?since_id={comments[0]["id"]}')
+        assert response.status_code == 200
+        assert [comment['id'] for comment in response.json()['results']] == [
+            comments[2]['id'], comments[1]['id']
+        ], 'Проверьте, что `since_id` возвращает только более новые комментарии'
+        last = client.get(url).json()['results'][0]
+        response = client.get(url, {'since': last['pub_date']})
+        assert response.json()['results'] == [], (
+            'Проверьте, что `since` возвращает комментарии, добавленные позже указанной даты'
+        )
+        for params in ({'wait': 1}, {'since_id': 1, 'wait': 1000}, {'since_id': 'abc'}):
+            response = client.get(url, params)
+            assert response.status_code == 400, (
+                f'Проверьте, что при некорректных параметрах {params} возвращается статус 400'
+            )
+        version = comment_notifier.version(reviews[0]['id'])
+        admin_client.post(url, data={'text': 'новый'})
+        assert comment_notifier.version(reviews[0]['id']) == version + 1, (
+            'Проверьте, что добавление комментария будит ожидающие запросы'
+        )
+        response = client.get(url, {'since_id': comments[0]['id'], 'wait': 5})
+        assert len(response.json()['results']) == 3, (
+            'Проверьте, что при наличии новых комментариев ответ возвращается без ожидания'
+        )
+
+    def test_07_comment_notifier(self):
+        notifier = CommentNotifier()
+        version = notifier.version(1)
+        assert not notifier.wait(1, version, 0.01)
+        timer = threading.Timer(0.05, notifier.notify, args=(1,))
+        timer.start()
+        assert notifier.wait(1, version, 5), (
+            'Проверьте, что ожидание прерывается при новом комментарии'
+        )
+        timer.join()
+        assert notifier.version(1) == version + 1
+        assert notifier.version(2) == 0
+        found = threading.Event()
+        timer = threading.Timer(0.05, found.set)
+        timer.start()
+        assert notifier.wait_until(2, found.is_set, 5, 0.01), (
+            'Проверьте, что ожидание перепроверяет условие без уведомления '
+            'из этого процесса'
+        )
+        timer.join()
+        assert not notifier.wait_until(2, lambda: False, 0.05, 0.01)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_compact_comments(self, client, admin_client, admin):
+        comments, reviews, titles, user, moderator = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        full = client.get(url)
+        assert full.json()['results'][0]['review'] == 'qwerty', (
+            'Проверьте, что без указания версии комментарии возвращаются в прежнем формате'
+        )
+        assert 'Accept' in full['Vary']
+        compact = client.get(url, HTTP_ACCEPT='application/json; version=2')
+        assert compact.status_code == 200
+        data = compact.json()
+        assert [comment['review'] for comment in data['results']] == [reviews[0]['id']] * 3, (
+            'Проверьте, что в компактном формате комментарий ссылается на id отзыва'
+        )
+        assert data['review'] == {'id': reviews[0]['id'], 'excerpt': 'qwerty'}, (
+            'Проверьте, что в компактном формате отзыв возвращается один раз на ответ'
+        )
+        response = client.get(url, HTTP_ACCEPT='application/json; version=3')
+        assert response.status_code == 406
@@ -0,0 +1,133 @@
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Review, ScoreCount, Title
+
+from .common import auth_client, create_reviews
+
+
+class Test08TitleRating:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_follows_review_changes(self, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        response = admin_client.get(f'/api/v1/titles/{title_id}/')
+        assert response.json().get('rating') == 4, (
+            'Проверьте, что `rating` произведения пересчитывается при создании отзыва'
+        )
+        auth_client(moderator).delete(f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/')
+        title = Title.objects.get(id=title_id)
+        assert (title.score_sum, title.reviews_count, title.rating) == (7, 2, 3.5), (
+            'Проверьте, что при удалении отзыва пересчитываются `score_sum`, `reviews_count` и `rating`'
+        )
+        Review.objects.filter(title_id=title_id).delete()
+        Title.objects.filter(id=title_id).update(score_sum=100, reviews_count=1, rating=100)
+        call_command('recount_ratings')
+        title = Title.objects.get(id=title_id)
+        assert (title.score_sum, title.reviews_count, title.rating) == (0, 0, None), (
+            'Проверьте, что команда `recount_ratings` пересчитывает рейтинг по отзывам'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_top_titles(self, client, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        admin_client.post(f'/api/v1/titles/{titles[1]["id"]}/reviews/', data={'text': 'Отлично', 'score': 10})
+        call_command('refresh_top_titles')
+        response = client.get('/api/v1/titles/top/')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/top/` возвращается статус 200'
+        )
+        data = response.json()
+        assert [title['id'] for title in data] == [titles[1]['id'], titles[0]['id']], (
+            'Проверьте, что `/api/v1/titles/top/` упорядочивает произведения по взвешенному рейтингу'
+        )
+        prior = (5 + 3 + 4 + 10) / 4
+        assert data[0]['weighted_rating'] == pytest.approx((prior * 25 + 10) / 26)
+        auth_client(user).post(f'/api/v1/titles/{titles[1]["id"]}/reviews/', data={'text': 'Плохо', 'score': 1})
+        response = client.get('/api/v1/titles/top/?limit=1')
+        data = response.json()
+        assert len(data) == 1 and data[0]['weighted_rating'] == pytest.approx((prior * 25 + 11) / 27), (
+            'Проверьте, что взвешенный рейтинг обновляется при изменении отзывов'
+        )
+        response = client.get(f'/api/v1/titles/top/?genre={titles[1]["genre"][0]}')
+        assert [title['id'] for title in response.json()] == [titles[1]['id']], (
+            'Проверьте, что `/api/v1/titles/top/` фильтрует по жанру'
+        )
+        response = client.get('/api/v1/titles/top/?limit=0')
+        assert response.status_code == 400
+        expected = [title['id'] for title in client.get('/api/v1/titles/top/').json()]
+        Title.objects.update(score_sum=0, reviews_count=1, rating=None)
+        Title.objects.filter(id=expected[-1]).update(weighted_rating=100)
+        call_command('recount_ratings')
+        assert [title['id'] for title in client.get('/api/v1/titles/top/').json()] == expected, (
+            'Проверьте, что после `recount_ratings` взвешенный рейтинг пересчитан'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_title_score_stats(self, client, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        response = client.get(f'/api/v1/titles/{title_id}/stats/')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/{title_id}/stats/` возвращается статус 200'
+        )
+        data = response.json()
+        assert data['histogram'] == {str(score): int(score in (3, 4, 5)) for score in range(1, 11)}, (
+            'Проверьте, что `/api/v1/titles/{title_id}/stats/` возвращает гистограмму оценок'
+        )
+        assert (data['count'], data['mean'], data['median']) == (3, 4, 4)
+        assert data['std_dev'] == pytest.approx((2 / 3) ** 0.5)
+        auth_client(user).patch(f'/api/v1/titles/{title_id}/reviews/{reviews[1]["id"]}/', data={'score': 10})
+        admin_client.delete(f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/')
+        data = client.get(f'/api/v1/titles/{title_id}/stats/').json()
+        assert (data['count'], data['median'], data['histogram']['3'], data['histogram']['10']) == (2, 7, 0, 1), (
+            'Проверьте, что гистограмма оценок обновляется при изменении и удалении отзывов'
+        )
+        data = client.get(f'/api/v1/titles/{titles[1]["id"]}/stats/').json()
+        assert data['count'] == 0 and data['median'] is None
+        ScoreCount.objects.all().delete()
+        call_command('recount_ratings')
+        assert client.get(f'/api/v1/titles/{title_id}/stats/').json()['count'] == 2, (
+            'Проверьте, что команда `recount_ratings` пересчитывает гистограммы оценок'
+        )
+        assert client.get('/api/v1/titles/100500/stats/').status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_rating_follows_cascades(self, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204
+        left = Review.objects.filter(title_id=title_id)
+        scores = [review.score for review in left]
+        title = Title.objects.get(id=title_id)
+        assert (title.score_sum, title.reviews_count, title.rating) == (
+            sum(scores), len(scores), sum(scores) / len(scores)
+        ), 'Проверьте, что рейтинг пересчитывается при каскадном удалении отзывов'
+        stats = admin_client.get(f'/api/v1/titles/{title_id}/stats/').json()
+        assert stats['count'] == len(scores) and sum(stats['histogram'].values()) == len(scores), (
+            'Проверьте, что гистограмма оценок пересчитывается при каскадном удалении отзывов'
+        )
+        review = left.first()
+        review.score = 10
+        review.save()
+        title = Title.objects.get(id=title_id)
+        assert title.score_sum == sum(scores) - scores[0] + 10, (
+            'Проверьте, что рейтинг пересчитывается при изменении отзыва вне API'
+        )
+        histogram = admin_client.get(f'/api/v1/titles/{title_id}/stats/').json()['histogram']
+        assert histogram['10'] == 1 and sum(histogram.values()) == len(scores)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_title_save_keeps_rating(self, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        title_id = titles[1]['id']
+        stale = Title.objects.get(id=title_id)
+        admin_client.post(f'/api/v1/titles/{title_id}/reviews/', data={'text': 'Текст', 'score': 9})
+        stale.description = 'Новое описание'
+        stale.save()
+        title = Title.objects.get(id=title_id)
+        assert (title.score_sum, title.reviews_count, title.rating, title.description) == (
+            9, 1, 9, 'Новое описание'
+        ), 'Проверьте, что сохранение произведения не перезаписывает рейтинг, изменённый отзывами'
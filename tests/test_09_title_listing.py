@@ -0,0 +1,299 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reviews.models import ResourceVersion, Title
+
+from .common import create_reviews, create_titles
+
+
+class Test09TitleListing:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_titles_cursor_pagination(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?cursor=')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/?cursor=` возвращается статус 200'
+        )
+        data = response.json()
+        assert 'count' not in data and 'next' in data and 'previous' in data, (
+            'Проверьте, что при постраничном выводе по курсору не возвращается `count`'
+        )
+        assert [title['id'] for title in data['results']] == [titles[1]['id'], titles[0]['id']], (
+            'Проверьте, что при выводе по курсору произведения упорядочены по убыванию `id`'
+        )
+        response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что без параметра `cursor` сохраняется постраничный вывод по номеру страницы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_titles_constant_queries(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        with CaptureQueriesContext(connection) as few:
+            client.get('/api/v1/titles/')
+        for number in range(8):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {number}', 'year': 2001,
+                'genre': [genre['slug'] for genre in genres],
+                'category': categories[0]['slug']
+            })
+        with CaptureQueriesContext(connection) as many:
+            response = client.get('/api/v1/titles/')
+        assert len(response.json()['results']) == 10
+        assert len(many) == len(few), (
+            'Проверьте, что количество запросов к БД при GET запросе `/api/v1/titles/` '
+            'не зависит от количества произведений на странице'
+        )
+        with CaptureQueriesContext(connection) as detail:
+            client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert len(detail) == 3, (
+            'Проверьте, что при GET запросе `/api/v1/titles/{title_id}/` категория и жанры '
+            'загружаются постоянным числом запросов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_titles_full_text_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?search=ДРАМА')
+        assert [title['id'] for title in response.json()['results']] == [titles[1]['id']], (
+            'Проверьте, что `search` ищет по описанию произведения без учёта регистра'
+        )
+        admin_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'description': 'Драма и пике'})
+        response = client.get('/api/v1/titles/?search=драма года')
+        assert [title['id'] for title in response.json()['results']] == [titles[1]['id']], (
+            'Проверьте, что `search` требует совпадения всех слов запроса'
+        )
+        response = client.get('/api/v1/titles/?search=драма')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что поисковый индекс обновляется при изменении произведения'
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        response = client.get('/api/v1/titles/?search=драма')
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что поисковый индекс обновляется при удалении произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_titles_suggest(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/suggest/?q=ПОВОРОТ ту')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/suggest/` возвращается статус 200'
+        )
+        assert response.json() == [{'id': titles[0]['id'], 'name': titles[0]['name']}], (
+            'Проверьте, что `/api/v1/titles/suggest/` ищет по началу слов названия без учёта регистра '
+            'и возвращает только `id` и `name`'
+        )
+        response = client.get('/api/v1/titles/suggest/?q=драм')
+        assert response.json() == [], (
+            'Проверьте, что `/api/v1/titles/suggest/` ищет только по названию произведения'
+        )
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Поворот обратно'})
+        response = client.get('/api/v1/titles/suggest/?q=пов')
+        assert [title['name'] for title in response.json()] == ['Поворот обратно', 'Поворот туда'], (
+            'Проверьте, что подсказки обновляются при изменении произведения и упорядочены по названию'
+        )
+        admin_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'name': 'Обратный поворот'})
+        response = client.get('/api/v1/titles/suggest/?q=обрат')
+        assert [title['name'] for title in response.json()] == ['Обратный поворот', 'Поворот обратно'], (
+            'Проверьте, что подсказки сначала возвращают названия, начинающиеся с запроса, '
+            'а затем совпадения по началу других слов названия'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_titles_multiple_slugs_filter(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        response = client.get(f'/api/v1/titles/?genre={genres[0]["slug"]},{genres[2]["slug"]}')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что фильтр `genre` со списком жанров через запятую '
+            'возвращает произведения любого из жанров без повторов'
+        )
+        response = client.get(
+            f'/api/v1/titles/?genre={genres[0]["slug"]},{genres[1]["slug"]}&genre_match=all'
+        )
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что при `genre_match=all` возвращаются произведения со всеми указанными жанрами'
+        )
+        response = client.get(
+            f'/api/v1/titles/?genre={genres[0]["slug"]},{genres[2]["slug"]}&genre_match=all'
+        )
+        assert response.json()['count'] == 0
+        response = client.get(f'/api/v1/titles/?category={categories[0]["slug"]},{categories[1]["slug"]}')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что фильтр `category` принимает список категорий через запятую'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_titles_year_range_filter(self, client, admin_client):
+        titles, categories, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?year_min=1999&year_max=2010')
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что фильтры `year_min` и `year_max` ограничивают год выхода'
+        )
+        response = client.get(f'/api/v1/titles/?decade=2020&category={categories[1]["slug"]}')
+        assert [title['id'] for title in response.json()['results']] == [titles[1]['id']], (
+            'Проверьте, что фильтр `decade` возвращает произведения десятилетия'
+        )
+        response = client.get('/api/v1/titles/?decade=1990')
+        assert response.json()['count'] == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_titles_conditional_get(self, client, admin_client):
+        titles, _, genres = create_titles(admin_client)
+        response = client.get('/api/v1/titles/')
+        etag = response['ETag']
+        assert etag and response.has_header('Last-Modified'), (
+            'Проверьте, что GET запрос `/api/v1/titles/` возвращает заголовки `ETag` и `Last-Modified`'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304 and len(queries) == 1, (
+            'Проверьте, что при совпадении `If-None-Match` возвращается статус 304 без запроса списка'
+        )
+        response = client.get('/api/v1/titles/?year=2000', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        detail_etag = response['ETag']
+        admin_client.patch(f'/api/v1/genres/{genres[0]["slug"]}/', data={'name': 'Хоррор'})
+        admin_client.delete(f'/api/v1/genres/{genres[0]["slug"]}/')
+        response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что изменение жанров меняет `ETag` списка произведений'
+        )
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/', HTTP_IF_NONE_MATCH=detail_etag)
+        assert response.status_code == 200
+        ResourceVersion.objects.update(updated=timezone.now() - timedelta(seconds=2))
+        response = client.get('/api/v1/genres/')
+        response = client.get('/api/v1/genres/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304, (
+            'Проверьте, что `/api/v1/genres/` учитывает заголовок `If-Modified-Since`'
+        )
+        response = client.get(f'/api/v1/genres/{genres[1]["slug"]}/')
+        assert response.status_code == 405
+        for command in ('recount_ratings', 'refresh_top_titles'):
+            etag = client.get('/api/v1/titles/')['ETag']
+            Title.objects.update(rating=1)
+            call_command(command)
+            response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200, (
+                f'Проверьте, что команда `{command}` меняет `ETag` списка произведений'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_13_titles_modified_within_second(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        admin_client.patch(url, data={'name': 'Первое имя'})
+        last_modified = client.get(url)['Last-Modified']
+        admin_client.patch(url, data={'name': 'Второе имя'})
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 200 and response.json()['name'] == 'Второе имя', (
+            'Проверьте, что `If-Modified-Since` не возвращает 304 после изменения '
+            'в ту же секунду, что и предыдущий ответ'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_titles_anonymous_cache(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?year=2000&name=По')
+        with CaptureQueriesContext(connection) as queries:
+            cached = client.get('/api/v1/titles/?name=По&year=2000')
+        assert cached.content == response.content and len(queries) == 1, (
+            'Проверьте, что повторный анонимный GET запрос `/api/v1/titles/` '
+            'с теми же параметрами отдаётся из кэша'
+        )
+        admin_client.post(f'/api/v1/titles/{titles[0]["id"]}/reviews/', data={'text': 'Текст', 'score': 9})
+        response = client.get('/api/v1/titles/?year=2000&name=По')
+        assert response.json()['results'][0]['rating'] == 9, (
+            'Проверьте, что кэш списка произведений сбрасывается при добавлении отзыва'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            admin_client.get('/api/v1/titles/?year=2000&name=По')
+        assert len(queries) > 2, (
+            'Проверьте, что ответы авторизованным пользователям не берутся из кэша'
+        )
+        Title.objects.update(score_sum=1, reviews_count=1, rating=1)
+        call_command('recount_ratings')
+        response = client.get('/api/v1/titles/?year=2000&name=По')
+        assert response.json()['results'][0]['rating'] == 9, (
+            'Проверьте, что кэш списка произведений сбрасывается после `recount_ratings`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_titles_cache_per_host(self, client, settings):
+        settings.ALLOWED_HOSTS = ['a.example', 'b.example']
+        Title.objects.bulk_create(Title(name=f'Произведение {number}') for number in range(11))
+        client.get('/api/v1/titles/', HTTP_HOST='a.example')
+        response = client.get('/api/v1/titles/', HTTP_HOST='b.example')
+        assert response.json()['next'].startswith('http://b.example/'), (
+            'Проверьте, что кэш списка произведений учитывает хост запроса'
+        )
+        response = client.get('/api/v1/titles/', HTTP_HOST='b.example', secure=True)
+        assert response.json()['next'].startswith('https://b.example/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_titles_sparse_fields(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/titles/?fields=id,name')
+        assert response.json()['results'][0] == {'id': titles[1]['id'], 'name': titles[1]['name']}, (
+            'Проверьте, что параметр `fields` оставляет в ответе только указанные поля'
+        )
+        select = [query['sql'] for query in queries if 'FROM "reviews_title"' in query['sql']]
+        assert select and all('"reviews_title"."description"' not in sql for sql in select), (
+            'Проверьте, что при указании `fields` не загружаются неиспользуемые столбцы'
+        )
+        assert not any('reviews_category' in query['sql'] or 'reviews_genre' in query['sql'] for query in queries), (
+            'Проверьте, что при указании `fields` не загружаются неиспользуемые связи'
+        )
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/?omit=genre,description,category')
+        assert set(response.json()) == {'id', 'name', 'year', 'rating'}, (
+            'Проверьте, что параметр `omit` исключает указанные поля из ответа'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_fast_list_serialization(self, admin_client, admin, settings):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        admin_client.delete('/api/v1/categories/books/')
+        urls = [
+            '/api/v1/titles/',
+            '/api/v1/titles/?cursor=',
+            '/api/v1/titles/?search=драма',
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/',
+        ]
+        settings.FAST_LIST_SERIALIZATION = False
+        expected = [admin_client.get(url).content for url in urls]
+        settings.FAST_LIST_SERIALIZATION = True
+        for url, content in zip(urls, expected):
+            assert admin_client.get(url).content == content, (
+                f'Проверьте, что быстрый вывод списка `{url}` совпадает с выводом сериализатора'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_titles_expand_reviews(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/?expand=reviews:2')
+        data = response.json()
+        assert [review['id'] for review in data.get('reviews', [])] == [reviews[2]['id'], reviews[1]['id']], (
+            'Проверьте, что `expand=reviews:N` добавляет в ответ N последних отзывов'
+        )
+        assert set(data['reviews'][0]) == {'id', 'author', 'text', 'pub_date', 'score'}
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/titles/?expand=reviews,category,genre')
+        results = response.json()['results']
+        assert [len(title['reviews']) for title in results] == [0, 3], (
+            'Проверьте, что `expand=reviews` работает для списка произведений'
+        )
+        assert len([query for query in queries if 'FROM "reviews_review"' in query['sql']]) == 1, (
+            'Проверьте, что отзывы для всей страницы загружаются одним запросом'
+        )
+        response = client.get('/api/v1/titles/?expand=comments')
+        assert response.status_code == 400
+        response = client.get('/api/v1/titles/?expand=reviews:100')
+        assert response.status_code == 400
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from reviews.notifications import comment_notifier
+
+from .common import auth_client, create_reviews
+
+
+def post_ndjson(api_client, records, raw_lines=()):
+    body = '\n'.join([json.dumps(record, ensure_ascii=False) for record in records] + list(raw_lines))
+    response = api_client.post('/api/v1/import/', data=body.encode(), content_type='application/x-ndjson')
+    return response
+
+
+class Test10ImportAPI:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_import_ndjson(self, client, admin_client, admin, settings):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        settings.IMPORT_BATCH_SIZE = 2
+        records = [
+            {'type': 'review', 'title_id': titles[1]['id'], 'author': user.username, 'text': 'Импорт', 'score': 10},
+            {'type': 'review', 'title_id': titles[0]['id'], 'author': user.username, 'text': 'Повтор', 'score': 1},
+            {'type': 'comment', 'review_id': reviews[0]['id'], 'author': moderator.username, 'text': 'Комментарий'},
+            {'type': 'review', 'title_id': titles[1]['id'], 'author': 'nobody', 'text': 'Текст', 'score': 5},
+            {'type': 'review', 'title_id': titles[1]['id'], 'author': moderator.username, 'text': 'Текст', 'score': 11},
+        ]
+        response = post_ndjson(client, records)
+        assert response.status_code == 401
+        response = post_ndjson(auth_client(moderator), records)
+        assert response.status_code == 403, (
+            'Проверьте, что импорт доступен только администратору'
+        )
+        version = comment_notifier.version(reviews[0]['id'])
+        response = post_ndjson(admin_client, records, ['{broken'])
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        assert comment_notifier.version(reviews[0]['id']) == version + 1, (
+            'Проверьте, что импорт комментариев будит ожидающие запросы'
+        )
+        assert [line['line'] for line in lines if 'line' in line] == [2, 4, 5, 6], (
+            'Проверьте, что импорт возвращает ошибки для каждой неправильной строки'
+        )
+        assert [line['processed'] for line in lines if 'processed' in line] == [2, 4, 6], (
+            'Проверьте, что импорт сообщает о ходе выполнения после каждой партии'
+        )
+        assert lines[-1] == {'done': True, 'created': {'review': 1, 'comment': 1}, 'errors': 4}
+        response = client.get(f'/api/v1/titles/{titles[1]["id"]}/')
+        assert response.json()['rating'] == 10, (
+            'Проверьте, что импорт отзывов пересчитывает рейтинг произведения'
+        )
+        response = client.get(f'/api/v1/titles/{titles[1]["id"]}/stats/')
+        assert response.json()['histogram']['10'] == 1
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/')
+        assert response.json()['count'] == 1
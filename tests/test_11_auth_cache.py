@@ -0,0 +1,148 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import UserInvalidationLog, invalidation_log
+from api.revocation import STORE_HEADER, STORE_MAGIC, BloomFilter, revocation_store
+from api.stores import database_identity
+from reviews.models import User
+
+from .common import auth_client
+
+
+def user_queries(queries):
+    return [query for query in queries if 'FROM "reviews_user"' in query['sql']]
+
+
+@pytest.fixture(autouse=True)
+def auth_stores(settings, tmp_path):
+    settings.TOKEN_REVOCATION_PATH = str(tmp_path / 'revoked.bin')
+    settings.JWT_AUTH_INVALIDATION_PATH = str(tmp_path / 'invalidations.bin')
+    revocation_store.reset()
+    invalidation_log.reset()
+
+
+class Test11AuthCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_cached_token_user(self, admin_client, user):
+        user_client = auth_client(user)
+        url = '/api/v1/users/me/reviews/'
+        assert user_client.get(url).status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(url)
+        assert response.status_code == 200
+        assert user_queries(queries) == [], (
+            'Проверьте, что повторный запрос с тем же токеном не загружает пользователя из базы'
+        )
+        response = user_client.get('/api/v1/users/me/')
+        assert response.json()['email'] == user.email
+
+        url = f'/api/v1/users/{user.username}/reviews/'
+        assert user_client.get(url).status_code == 403
+        response = admin_client.patch(f'/api/v1/users/{user.username}/', data={'role': 'moderator'})
+        assert response.status_code == 200
+        assert user_client.get(url).status_code == 200, (
+            'Проверьте, что изменение пользователя сбрасывает его закэшированные данные'
+        )
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что удалённый пользователь не проходит аутентификацию'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_logout(self, client, user):
+        user_client = auth_client(user)
+        other_client = auth_client(user)
+        assert client.post('/api/v1/auth/logout/').status_code == 401
+        assert user_client.get('/api/v1/users/me/').status_code == 200
+        response = user_client.post('/api/v1/auth/logout/')
+        assert response.status_code == 204
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что после выхода токен больше не принимается'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = other_client.get('/api/v1/users/me/reviews/')
+        assert response.status_code == 200, (
+            'Проверьте, что выход отзывает только текущий токен'
+        )
+        assert not [query for query in queries if 'revokedtoken' in query['sql']], (
+            'Проверьте, что проверка неотозванного токена не обращается к базе'
+        )
+        revocation_store.reset()
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что отозванные токены загружаются из хранилища'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_revoke_all_tokens(self, client, admin_client, user, moderator):
+        user_client = auth_client(user)
+        url = f'/api/v1/users/{user.username}/revoke-tokens/'
+        assert auth_client(moderator).post(url).status_code == 403
+        assert admin_client.post(url).status_code == 204
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что администратор может отозвать все токены пользователя'
+        )
+        assert auth_client(moderator).get('/api/v1/users/me/').status_code == 200
+        response = client.post('/api/v1/auth/token/', data={
+            'username': user.username, 'confirmation_code': user.confirmation_code
+        })
+        assert response.status_code == 200
+        token = response.json()['access']
+        response = client.get('/api/v1/users/me/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert response.status_code == 200, (
+            'Проверьте, что токен, выданный сразу после отзыва всех токенов, принимается'
+        )
+
+    def test_04_bloom_filter(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        keys = [f'jti-{number}' for number in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        false_positives = sum(f'other-{number}' in bloom for number in range(10000))
+        assert false_positives < 300
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_invalidation_from_other_process(self, user, settings):
+        settings.JWT_AUTH_SYNC_INTERVAL = 0
+        user_client = auth_client(user)
+        url = f'/api/v1/users/{user.username}/reviews/'
+        assert user_client.get(url).status_code == 403
+        User.objects.filter(id=user.id).update(role='moderator')
+        assert user_client.get(url).status_code == 403
+        UserInvalidationLog().publish(user.id)
+        assert user_client.get(url).status_code == 200, (
+            'Проверьте, что изменение пользователя в другом процессе сбрасывает его закэшированные данные'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_revocation_store_of_other_database(self, user, settings):
+        user_client = auth_client(user)
+        assert user_client.post('/api/v1/auth/logout/').status_code == 204
+        with open(settings.TOKEN_REVOCATION_PATH, 'wb') as store:
+            store.write(STORE_HEADER.pack(STORE_MAGIC, b'other-db', 8, 1, 0) + bytes(1))
+        revocation_store.reset()
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что хранилище отозванных токенов другой базы данных не используется'
+        )
+        with open(settings.TOKEN_REVOCATION_PATH, 'rb') as store:
+            assert store.read(12)[4:] == database_identity()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_invalidation_log_of_other_database(self, user, settings):
+        settings.JWT_AUTH_SYNC_INTERVAL = 0
+        user_client = auth_client(user)
+        url = f'/api/v1/users/{user.username}/reviews/'
+        assert user_client.get(url).status_code == 403
+        User.objects.filter(id=user.id).update(role='moderator')
+        log = UserInvalidationLog()
+        with open(settings.JWT_AUTH_INVALIDATION_PATH, 'wb') as other:
+            other.write(log.header.pack(log.magic, b'other-db') + log.entry.pack(5, 0))
+        assert user_client.get(url).status_code == 200, (
+            'Проверьте, что журнал изменений пользователей другой базы данных '
+            'сбрасывает закэшированных пользователей'
+        )
+        assert log.read() is None
+        log.publish(user.id)
+        assert log.read() == [(1, user.id)]